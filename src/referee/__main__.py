@@ -3,10 +3,16 @@ Driver program to instantiate two Player classes
 and begin a game between them.
 """
 
+import os
+import sys
+
 from referee.log import StarLog
 from referee.game import play, IllegalActionException
 from referee.player import PlayerWrapper, ResourceLimitException, set_space_line
 from referee.options import get_options
+from referee.forkserver import ForkServer
+from referee.render import GridRenderer
+from referee.snapshots import SnapshotPublisher
 
 def main():
     # Parse command-line options into a namespace for use throughout this
@@ -15,19 +21,58 @@ def main():
 
     # Create a star-log for controlling the format of output from within this
     # program
-    out = StarLog(level=options.verbosity, ansi=options.use_colour)
+    # (when redrawing the board in place, the screen is never cleared)
+    # (output that nobody is watching line by line can be written out in the
+    # background: a batch of games, which only prints results, and any game
+    # whose output goes to a file or pipe or is only its result; a game shown
+    # in the terminal, redrawn in place or waiting for the user to press
+    # enter is still written line by line)
+    watched = sys.stdout.isatty() and options.verbosity > 0
+    out = StarLog(level=options.verbosity,
+            ansi=options.use_colour and not options.redraw,
+            buffered=(options.games > 1 or not (watched or options.redraw
+                or options.delay < 0)))
     out.comment("all messages printed by the referee after this begin with a *")
     out.comment("(any other lines of output must be from your Player classes).")
     out.comment()
 
+    # Create a shared memory block to publish the positions in, if requested
+    snapshots = None
+    if options.publish is not None:
+        try:
+            snapshots = SnapshotPublisher(options.publish or None)
+        except (OSError, RuntimeError) as e:
+            out.print(f"error: cannot publish positions: {e}")
+            out.close()
+            return
+        out.comment(f"publishing positions in shared memory block "
+            f"'{snapshots.name}'")
+
+    if options.games > 1:
+        try:
+            play_batch(options, out, snapshots and snapshots.channel(0))
+        finally:
+            if snapshots is not None:
+                snapshots.close()
+            out.close()
+        return
+
+    renderer = None
+    players = []
     try:
         # Import player classes
         p1 = PlayerWrapper('player 1', options.player1_loc,
                 time_limit=options.time, space_limit=options.space,
-                logfn=out.comment)
+                logfn=out.comment, memory_profile=options.memory_profile)
         p2 = PlayerWrapper('player 2', options.player2_loc,
                 time_limit=options.time, space_limit=options.space,
-                logfn=out.comment)
+                logfn=out.comment, memory_profile=options.memory_profile)
+        players = [p1, p2]
+
+        # Reserve the top of the terminal for the board, if requested
+        if options.redraw and options.verbosity > 1:
+            renderer = GridRenderer(1, debugboard=(options.verbosity>2),
+                    unicodeboard=options.use_unicode)
 
         # We'll start measuring space usage from now, after all
         # library imports should be finished:
@@ -41,7 +86,9 @@ def main():
                 print_state=(options.verbosity>1),
                 use_debugboard=(options.verbosity>2),
                 use_colour=options.use_colour,
-                use_unicode=options.use_unicode)
+                use_unicode=options.use_unicode,
+                renderer=renderer and renderer[0],
+                publisher=snapshots and snapshots.channel(0))
         # Display the final result of the game to the user.
         out.comment("game over!", depth=-1)
         out.print(result)
@@ -61,6 +108,61 @@ def main():
         out.comment(e)
     # If it's another kind of error then it might be coming from the player
     # itself? Then, a traceback will be more helpful.
+    finally:
+        # Restore normal scrolling if the board was being redrawn in place
+        if renderer is not None:
+            renderer.close()
+        # Remove the shared memory block (spectators keep what they hold)
+        if snapshots is not None:
+            snapshots.close()
+        # Report on the players' memory allocations, if they were traced
+        for player in players:
+            for line in player.memory_report():
+                out.comment(line)
+        # Write out any output still waiting in the background
+        out.close()
+
+def play_batch(options, out, publisher=None):
+    """
+    Play `options.games` games between the same two players, each in a child
+    process forked from a fork server that has preloaded both players (and
+    publishing their positions to `publisher`, if given). If a log file is
+    requested, each game is logged to its own numbered file. If memory
+    profiling is requested, each game's report comes before its result.
+    """
+    player_locs = [options.player1_loc, options.player2_loc]
+    try:
+        server = ForkServer(player_locs, logfn=out.comment)
+        set_space_line()
+        wins = [0, 0]
+        draws = 0
+        for num in range(1, options.games+1):
+            out.comment(f"game {num} of {options.games}", depth=-1)
+            winner, result = server.play_game(player_locs,
+                    time_limit=options.time, space_limit=options.space,
+                    logfilename=_numbered(options.logfile, num),
+                    publisher=publisher,
+                    memory_profile=options.memory_profile,
+                    logfn=out.comment)
+            if winner is None:
+                draws += 1
+            else:
+                wins[winner] += 1
+            out.comment(result, depth=1)
+    except KeyboardInterrupt:
+        print() # (end the line)
+        out.comment("bye!")
+        return
+    out.comment("all games over!", depth=-1)
+    out.print(f"player 1 wins: {wins[0]}, player 2 wins: {wins[1]}, "
+        f"draws: {draws}")
+
+def _numbered(path, num):
+    """Number a file name, e.g. game.log -> game-3.log (None stays None)."""
+    if path is None:
+        return None
+    root, ext = os.path.splitext(path)
+    return f"{root}-{num}{ext}"
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,88 @@
+"""
+Provide players with a view of their remaining resources, and a reusable
+way to decide how much time to spend on each action.
+
+If a Player class's `action` method accepts an argument, the referee passes
+it a `Budget` describing what is left of the player's time (and how many
+turns the game can still last):
+
+    from referee.budget import allocate
+
+    class Player:
+        def action(self, budget):
+            time_for_this_action = allocate(budget)
+            ...
+
+Players whose `action` method takes no arguments are called as before.
+"""
+
+from referee.game import _MAX_TURNS
+
+class Budget:
+    """
+    What remains of a player's resources, as the player chooses an action.
+
+    * `turn` is the number of this action among the player's actions in this
+      game (1 for the first action).
+    * `max_turns` is the greatest number of actions a player can take in one
+      game (after which the game is drawn).
+    * `time_limit` is the player's total CPU time limit, in seconds (or None
+      if unlimited). Note that time spent in `__init__` and `update` counts
+      towards the limit as well as time spent in `action`.
+    * `space_limit` is the player's memory limit, in MB (or None if
+      unlimited).
+    """
+    def __init__(self, timer, turn, space_limit=None):
+        self._timer = timer
+        self.turn = turn
+        self.max_turns = _MAX_TURNS
+        self.time_limit = timer.limit if timer.limit else None
+        self.space_limit = space_limit if space_limit else None
+
+    @property
+    def turns_left(self):
+        """The most actions the player might still have to take (including
+        this one)."""
+        return self.max_turns - self.turn + 1
+
+    def used(self):
+        """CPU time (in seconds) used by the player so far this game."""
+        return self._timer.elapsed()
+
+    def remaining(self):
+        """
+        CPU time (in seconds) the player has left to use this game, right
+        now (or None if time is unlimited).
+        """
+        if self.time_limit is None:
+            return None
+        return self.time_limit - self.used()
+
+    def __repr__(self):
+        remaining = self.remaining()
+        remaining = "unlimited" if remaining is None else f"{remaining:.3f}s"
+        return f"Budget(turn={self.turn}, remaining={remaining})"
+
+
+def allocate(budget, expected_turns=60, min_turns_to_go=10, reserve=0.05,
+        max_share=0.2, default=None):
+    """
+    Decide how much CPU time (in seconds) to spend on the current action,
+    spreading the remaining time over the actions still expected.
+
+    The game is assumed to last `expected_turns` actions per player, but at
+    least `min_turns_to_go` more actions are always allowed for (as long
+    games are not rare), and never more than the game's maximum. A fraction
+    `reserve` of the remaining time is held back to cover `update` calls and
+    overheads, and no single action gets more than a fraction `max_share` of
+    the remaining time.
+
+    If the budget has no time limit, return `default`.
+    """
+    remaining = budget.remaining()
+    if remaining is None:
+        return default
+    usable = max(remaining * (1 - reserve), 0.0)
+    turns_to_go = max(expected_turns - budget.turn + 1, min_turns_to_go)
+    turns_to_go = max(min(turns_to_go, budget.turns_left), 1)
+    return min(usable / turns_to_go, usable * max_share)
@@ -0,0 +1,220 @@
+"""
+Provide an index of the groups ('clusters') of stacks that would explode
+together, kept up to date as the board changes, so that the result of a BOOM
+on any square can be looked up immediately instead of searched for.
+
+A BOOM destroys the stack it is made on, then every stack on one of the 8
+surrounding squares, then every stack surrounding those, and so on. So
+the stacks destroyed by a BOOM at a square are exactly the 8-connected
+group of occupied squares containing it.
+
+The index works with any board given as a mapping from squares to signed
+stack heights (positive for White, negative for Black), such as the
+referee's `Game.board`. By default squares are (x, y) tuples, but a
+different function listing each square's neighbours can be supplied to use
+other kinds of square (e.g. the integer indices of a player's own board).
+"""
+
+def _near_squares(square):
+    x, y = square
+    return [(x+dx, y+dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)
+        if (dx or dy) and 0 <= x+dx < 8 and 0 <= y+dy < 8]
+
+_NEAR = {(x, y): _near_squares((x, y)) for x in range(8) for y in range(8)}
+
+
+class Cluster:
+    """
+    An 8-connected group of occupied squares, with the number of White and
+    Black tokens on them. A BOOM on any of the squares destroys them all.
+    """
+    __slots__ = ("squares", "white", "black")
+
+    def __init__(self):
+        self.squares = set()
+        self.white = 0
+        self.black = 0
+
+    def _change(self, before, after):
+        """Count a stack changing from height `before` to `after`."""
+        if before > 0:
+            self.white -= before
+        elif before < 0:
+            self.black += before
+        if after > 0:
+            self.white += after
+        elif after < 0:
+            self.black -= after
+
+    def tokens(self, colour):
+        """The number of tokens of `colour` that a BOOM here destroys."""
+        return self.white if colour == "white" else self.black
+
+    def __repr__(self):
+        return f"Cluster(squares={sorted(self.squares)}, " \
+            f"white={self.white}, black={self.black})"
+
+
+class ClusterIndex:
+    """
+    Maintain the clusters of a board as actions change it. Main useful
+    methods are `cluster` (query) and `move` and `boom` (updates).
+    """
+    def __init__(self, board, near=None):
+        """
+        Index the clusters of `board` (a mapping from square to signed stack
+        height). `near` is a function giving the squares surrounding a
+        square (by default, for (x, y) squares on the 8x8 board).
+        """
+        self.near = near if near is not None else _NEAR.__getitem__
+        self.heights = {sq: n for sq, n in board.items() if n}
+        self.clusters = {} # square -> Cluster
+        occupied = set(self.heights)
+        for square in self.heights:
+            if square not in self.clusters:
+                self._label(square, occupied)
+
+    def copy(self):
+        """An independent copy of this index (e.g. for use in search)."""
+        other = ClusterIndex.__new__(ClusterIndex)
+        other.near = self.near
+        other.heights = dict(self.heights)
+        other.clusters = {}
+        for square, cluster in self.clusters.items():
+            if square not in other.clusters:
+                clone = Cluster()
+                clone.squares = set(cluster.squares)
+                clone.white, clone.black = cluster.white, cluster.black
+                for sq in clone.squares:
+                    other.clusters[sq] = clone
+        return other
+
+    def cluster(self, square):
+        """
+        The cluster a BOOM at `square` would destroy (or None if the square
+        is empty). Don't modify the result.
+        """
+        return self.clusters.get(square)
+
+    def boom_tokens(self, square):
+        """
+        The number of (White, Black) tokens that a BOOM at `square` would
+        destroy.
+        """
+        cluster = self.clusters.get(square)
+        if cluster is None:
+            return 0, 0
+        return cluster.white, cluster.black
+
+    def move(self, a, b, n):
+        """Update the index for `n` tokens moving from square `a` to `b`."""
+        before = self.heights[a]
+        n = n if before > 0 else -n
+        cluster = self.clusters.get(b)
+        if n != before and cluster is not None \
+                and cluster is self.clusters[a]:
+            # (both squares stay occupied, in the same cluster, with the
+            # same colour: only the heights change)
+            self.heights[a] = before - n
+            self.heights[b] += n
+            return
+        self.remove(a, n)
+        self.add(b, n)
+
+    def boom(self, square):
+        """
+        Update the index for a BOOM at `square`, and return the cluster of
+        squares destroyed.
+        """
+        cluster = self.clusters[square]
+        for sq in cluster.squares:
+            del self.clusters[sq]
+            del self.heights[sq]
+        return cluster
+
+    def add(self, square, n):
+        """Update the index for `n` (signed) tokens added to `square`."""
+        cluster = self.clusters.get(square)
+        if cluster is not None:
+            before = self.heights[square]
+            self.heights[square] = before + n
+            cluster._change(before, before + n)
+            return
+        # a new stack: it joins (and merges) the surrounding clusters
+        self.heights[square] = n
+        cluster = Cluster()
+        cluster.squares.add(square)
+        cluster._change(0, n)
+        self.clusters[square] = cluster
+        for near_square in self.near(square):
+            other = self.clusters.get(near_square)
+            if other is not None and other is not cluster:
+                cluster = self._merge(cluster, other)
+
+    def remove(self, square, n):
+        """Update the index for `n` (signed) tokens removed from `square`."""
+        cluster = self.clusters[square]
+        before = self.heights[square]
+        self.heights[square] = before - n
+        cluster._change(before, before - n)
+        if self.heights[square]:
+            return
+        # the stack is gone: the rest of its cluster may have come apart
+        del self.heights[square]
+        del self.clusters[square]
+        cluster.squares.discard(square)
+        remaining = cluster.squares
+        if self._still_connected(square, remaining):
+            return
+        for near_square in self.near(square):
+            if near_square in remaining \
+                    and self.clusters[near_square] is cluster:
+                self._label(near_square, remaining)
+
+    def _merge(self, cluster, other):
+        """Merge two clusters (relabelling the smaller one)."""
+        if len(cluster.squares) < len(other.squares):
+            cluster, other = other, cluster
+        for square in other.squares:
+            self.clusters[square] = cluster
+        cluster.squares |= other.squares
+        cluster.white += other.white
+        cluster.black += other.black
+        return cluster
+
+    def _still_connected(self, square, remaining):
+        """
+        Whether the stacks surrounding the (now empty) `square` are still
+        connected to each other through surrounding squares alone, in which
+        case removing the stack cannot have split its cluster (any path
+        through `square` can go round it), and no relabelling is needed.
+        """
+        near = [sq for sq in self.near(square) if sq in remaining]
+        if len(near) < 2:
+            return True
+        todo = [near.pop()]
+        for sq in todo:
+            for near_square in self.near(sq):
+                if near_square in near:
+                    near.remove(near_square)
+                    todo.append(near_square)
+        return not near
+
+    def _label(self, square, allowed):
+        """
+        Make a new cluster of all squares connected to `square` through
+        occupied squares in the set `allowed`.
+        """
+        cluster = Cluster()
+        cluster.squares.add(square)
+        self.clusters[square] = cluster
+        todo = [square]
+        for sq in todo:
+            cluster._change(0, self.heights[sq])
+            for near_square in self.near(sq):
+                if near_square in allowed \
+                        and near_square not in cluster.squares:
+                    cluster.squares.add(near_square)
+                    self.clusters[near_square] = cluster
+                    todo.append(near_square)
+        return cluster
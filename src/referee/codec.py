@@ -0,0 +1,252 @@
+"""
+Provide compact, fixed-size encodings of game positions, for storing,
+hashing and sending many positions cheaply.
+
+Binary format: every position is exactly 24 bytes (all fields little-endian):
+
+    bytes  0-7   White occupancy: bit x*8+y is set if White has a stack on
+                 square (x, y)
+    bytes  8-15  Black occupancy (likewise)
+    bytes 16-19  stack heights: for each occupied square in order of bit
+                 index, a stack of height h is written as h-1 one bits
+                 followed by a zero bit, starting from the lowest bit (since
+                 there are never more than 24 tokens on the board, this
+                 takes at most 24 bits)
+    bytes 20-21  number of turns taken so far in the game
+    byte  22     side to move: 0 for White, 1 for Black
+    byte  23     reserved (zero)
+
+Text format: a FEN-like string such as
+
+    aa1aa1aa/aa1aa1aa/8/8/8/8/AA1AA1AA/AA1AA1AA w 0
+
+listing the rows of the board from the top (y=7) to the bottom (y=0),
+each from left (x=0) to right (x=7). White stacks of height 1 to 12 are
+written 'A' to 'L', Black stacks 'a' to 'l', and runs of empty squares as
+digits. The side to move ('w' or 'b') and the number of turns taken so far
+follow.
+
+Positions are passed to and from these functions as a board (either a
+mapping from (x, y) to signed stack height, such as the referee's
+`Game.board`, or a sequence of 64 signed stack heights with square (x, y)
+at index x*8+y), along with the turn count and side to move. Decoding
+always produces a tuple of 64 signed stack heights.
+
+Bulk encoding and decoding to and from NumPy arrays is also available, if
+NumPy is installed.
+"""
+
+import struct
+from collections import namedtuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+SIZE = 24
+_STRUCT = struct.Struct("<QQIHBx")
+
+Position = namedtuple("Position", ["board", "nturns", "side"])
+SIDES = "white", "black"
+
+MAX_HEIGHT = 12 # (tokens per player, so the most in one stack)
+MAX_TOKENS = 24
+MAX_NTURNS = 2**16 - 1
+
+def _heights(board):
+    """Get a list of 64 signed stack heights from either kind of board."""
+    if hasattr(board, "items"):
+        heights = [0] * 64
+        for (x, y), n in board.items():
+            heights[x*8 + y] = n
+        return heights
+    return board
+
+def _check(heights, nturns):
+    """
+    Raise a ValueError unless `heights` (64 signed stack heights) and
+    `nturns` describe a position that can be encoded.
+    """
+    if len(heights) != 64:
+        raise ValueError(f"invalid position: {len(heights)} squares, not 64")
+    tokens = 0
+    for n in heights:
+        if abs(n) > MAX_HEIGHT:
+            raise ValueError(f"invalid position: a stack of {abs(n)} tokens "
+                f"(at most {MAX_HEIGHT} allowed)")
+        tokens += abs(n)
+    if tokens > MAX_TOKENS:
+        raise ValueError(f"invalid position: {tokens} tokens (at most "
+            f"{MAX_TOKENS} allowed)")
+    if not 0 <= nturns <= MAX_NTURNS:
+        raise ValueError(f"invalid position: turn count {nturns} out of "
+            f"range")
+
+def encode(board, nturns=0, side=None):
+    """
+    Encode a position as 24 bytes. `side` is the side to move ("white" or
+    "black"), by default worked out from `nturns` (White moves first).
+    Raise a ValueError if the position has a stack of more than 12 tokens
+    or more than 24 tokens in all.
+    """
+    heights = _heights(board)
+    _check(heights, nturns)
+    if side is None:
+        side = nturns % 2
+    elif isinstance(side, str):
+        side = SIDES.index(side)
+    white = black = code = 0
+    bit = 0
+    for i, n in enumerate(heights):
+        if n > 0:
+            white |= 1 << i
+        elif n < 0:
+            black |= 1 << i
+            n = -n
+        else:
+            continue
+        code |= ((1 << (n-1)) - 1) << bit
+        bit += n
+    return _STRUCT.pack(white, black, code, nturns, side)
+
+def decode(data):
+    """Decode 24 bytes into a Position (board, nturns, side)."""
+    white, black, code, nturns, side = _STRUCT.unpack(data)
+    board = [0] * 64
+    for i in range(64):
+        mask = 1 << i
+        if (white | black) & mask:
+            n = 1
+            while code & 1:
+                n += 1
+                code >>= 1
+            code >>= 1
+            board[i] = n if white & mask else -n
+    return Position(tuple(board), nturns, SIDES[side])
+
+
+_WHITE_LETTERS = "ABCDEFGHIJKL"
+_BLACK_LETTERS = "abcdefghijkl"
+
+def to_text(board, nturns=0, side=None):
+    """
+    Write a position in text notation (raising a ValueError for positions
+    that `encode` would not accept).
+    """
+    if side is None:
+        side = SIDES[nturns % 2]
+    heights = _heights(board)
+    _check(heights, nturns)
+    rows = []
+    for y in range(7, -1, -1):
+        row = ""
+        empty = 0
+        for x in range(8):
+            n = heights[x*8 + y]
+            if n == 0:
+                empty += 1
+                continue
+            if empty:
+                row += str(empty)
+                empty = 0
+            row += _WHITE_LETTERS[n-1] if n > 0 else _BLACK_LETTERS[-n-1]
+        if empty:
+            row += str(empty)
+        rows.append(row)
+    return f"{'/'.join(rows)} {side[0]} {nturns}"
+
+def from_text(text):
+    """Read a position from text notation, returning a Position."""
+    fields = text.split()
+    try:
+        layout = fields[0]
+        side = {"w": "white", "b": "black"}[fields[1]] if len(fields) > 1 \
+            else "white"
+        nturns = int(fields[2]) if len(fields) > 2 else 0
+        rows = layout.split("/")
+        if len(rows) != 8:
+            raise ValueError("expected 8 rows")
+        board = [0] * 64
+        for y, row in zip(range(7, -1, -1), rows):
+            x = 0
+            for char in row:
+                if char.isdigit():
+                    x += int(char)
+                elif char in _WHITE_LETTERS:
+                    board[x*8 + y] = _WHITE_LETTERS.index(char) + 1
+                    x += 1
+                elif char in _BLACK_LETTERS:
+                    board[x*8 + y] = -(_BLACK_LETTERS.index(char) + 1)
+                    x += 1
+                else:
+                    raise ValueError(f"unexpected character {char!r}")
+            if x != 8:
+                raise ValueError(f"row {row!r} does not have 8 squares")
+        _check(board, nturns)
+    except (IndexError, KeyError, ValueError) as e:
+        raise ValueError(f"invalid position {text!r}: {e}") from None
+    return Position(tuple(board), nturns, side)
+
+
+# Bulk encoding and decoding with NumPy:
+
+if np is not None:
+    DTYPE = np.dtype([("white", "<u8"), ("black", "<u8"), ("heights", "<u4"),
+        ("nturns", "<u2"), ("side", "u1"), ("reserved", "u1")])
+    assert DTYPE.itemsize == SIZE
+
+def encode_array(boards, nturns=0, sides=None):
+    """
+    Encode an (N, 8, 8) int8 array of boards (indexed [i, x, y]) as a NumPy
+    array of N records (of dtype `DTYPE`; use `.tobytes()` to get the 24*N
+    bytes). `nturns` and `sides` (0 for White to move, 1 for Black) may be
+    scalars or arrays of length N; by default, the side to move is worked
+    out from `nturns`.
+    """
+    boards = np.asarray(boards, dtype=np.int8).reshape(-1, 64)
+    records = np.zeros(len(boards), dtype=DTYPE)
+    bits = np.uint64(1) << np.arange(64, dtype=np.uint64)
+    records["white"] = ((boards > 0) * bits).sum(axis=1, dtype=np.uint64)
+    records["black"] = ((boards < 0) * bits).sum(axis=1, dtype=np.uint64)
+    heights = np.abs(boards).astype(np.uint64)
+    # bit offset of each square's code: the number of tokens before it
+    offsets = np.cumsum(heights, axis=1, dtype=np.uint64) - heights
+    ones = np.where(heights > 0,
+        (np.uint64(1) << np.maximum(heights, 1) - np.uint64(1)) - np.uint64(1),
+        np.uint64(0))
+    records["heights"] = (ones << offsets).sum(axis=1, dtype=np.uint64)
+    records["nturns"] = nturns
+    records["side"] = np.asarray(nturns) % 2 if sides is None else sides
+    return records
+
+def decode_array(records):
+    """
+    Decode an array of records (or a bytes-like object of 24*N bytes) into a
+    tuple (boards, nturns, sides), where `boards` is an (N, 8, 8) int8 array
+    and `nturns` and `sides` are arrays of length N.
+    """
+    if not isinstance(records, np.ndarray):
+        records = np.frombuffer(records, dtype=DTYPE)
+    n = len(records)
+    white = records["white"]
+    black = records["black"]
+    code = records["heights"].astype(np.uint64)
+    boards = np.zeros((n, 64), dtype=np.int8)
+    one = np.uint64(1)
+    for i in range(64):
+        bit = np.uint64(i)
+        is_white = (white >> bit) & one
+        is_black = (black >> bit) & one
+        occupied = (is_white | is_black).astype(bool)
+        if not occupied.any():
+            continue
+        # the stack's height is one more than the number of trailing ones in
+        # its code (found from the lowest zero bit, ~code & (code + 1))
+        lowest_zero = ~code & (code + one)
+        height = np.log2(lowest_zero.astype(np.float64)).astype(np.int8) + 1
+        height *= occupied
+        boards[:, i] = np.where(is_white.astype(bool), height, -height)
+        code = np.where(occupied, code >> height.astype(np.uint64), code)
+    return boards.reshape(n, 8, 8), records["nturns"].copy(), \
+        records["side"].copy()
@@ -0,0 +1,303 @@
+"""
+Provide a 'fork server' for playing many games in a row without paying
+for player start-up costs every game.
+
+The server imports each player package once (and gives each Player class a
+chance to load any large, read-only data it needs, such as opening books or
+weight tables) in the parent process. Each game is then played in a fresh
+child process forked from that parent, so the child starts with everything
+already imported and loaded (shared copy-on-write with the parent), but any
+state the game itself creates is thrown away when the child exits.
+
+A Player class may declare shared data to preload by defining a `preload`
+classmethod (or staticmethod), taking no arguments. It will be called once,
+in the parent process, before any games are played. For example:
+
+    class Player:
+        @classmethod
+        def preload(cls):
+            cls.book = load_opening_book("book.bin")
+
+On platforms without `os.fork` (e.g. Windows) the server falls back to
+running each job directly in the current process.
+"""
+
+import os
+import gc
+import sys
+import pickle
+import random
+import signal
+import selectors
+import traceback
+
+from referee.game import play, IllegalActionException, COLOURS
+from referee.player import PlayerWrapper, ResourceLimitException, \
+    _load_player_class
+
+FORK_ENABLED = hasattr(os, "fork")
+
+class ForkServer:
+    """
+    Preload player packages in this process, then run jobs (such as games)
+    in forked child processes. Main useful methods are `submit`, `run` and
+    `as_completed`.
+    """
+    def __init__(self, player_locs, logfn=None):
+        """
+        Import the Player class for each location in `player_locs` (a list of
+        (package, class) tuples, as produced by `options.PackageSpecAction`),
+        and run the `preload` hook of each class (if it has one).
+        """
+        self.log = logfn if logfn else (lambda *_, **__: None) # no-op
+        self.classes = {}
+        for player_loc in player_locs:
+            if player_loc in self.classes:
+                continue
+            player_pkg, player_cls = player_loc
+            self.log(f"preloading player class '{player_cls}' "
+                f"from package '{player_pkg}'")
+            Player = _load_player_class(player_pkg, player_cls)
+            preload = getattr(Player, "preload", None)
+            if callable(preload):
+                preload()
+            self.classes[player_loc] = Player
+        # Objects created up to now will never be freed, so move them out of
+        # sight of the garbage collector. Otherwise each child's first
+        # collection would touch (and so copy) every page the parent filled.
+        if FORK_ENABLED and hasattr(gc, "freeze"):
+            gc.collect()
+            gc.freeze()
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Start computing `fn(*args, **kwargs)` in a forked child process and
+        return a job handle (use `job.result()` to wait for the return value).
+        The return value (or exception) must be picklable.
+        """
+        if not FORK_ENABLED:
+            return _Job.run_inline(fn, args, kwargs)
+        # (anything still buffered would otherwise be written by both processes)
+        sys.stdout.flush()
+        sys.stderr.flush()
+        rfd, wfd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            # child: compute the result, send it back, and exit immediately
+            # (without running the parent's cleanup handlers)
+            os.close(rfd)
+            _reseed_random()
+            status = 0
+            try:
+                try:
+                    payload = (True, fn(*args, **kwargs))
+                except BaseException as e:
+                    payload = (False, _picklable_exception(e))
+                data = pickle.dumps(payload, pickle.HIGHEST_PROTOCOL)
+                with os.fdopen(wfd, 'wb') as pipe:
+                    pipe.write(data)
+                sys.stdout.flush()
+                sys.stderr.flush()
+            except BaseException:
+                status = 1
+            finally:
+                os._exit(status)
+        # parent: keep the read end of the pipe to collect the result later
+        os.close(wfd)
+        return _Job(pid, rfd)
+
+    def run(self, fn, *args, **kwargs):
+        """Compute `fn(*args, **kwargs)` in a forked child and return it."""
+        return self.submit(fn, *args, **kwargs).result()
+
+    def as_completed(self, jobs):
+        """
+        Generate the given jobs in the order they finish (those already
+        finished first).
+        """
+        pending = []
+        for job in jobs:
+            if job.done():
+                yield job
+            else:
+                pending.append(job)
+        with selectors.DefaultSelector() as selector:
+            for job in pending:
+                selector.register(job.fd, selectors.EVENT_READ, job)
+            while pending:
+                for key, _ in selector.select():
+                    job = key.data
+                    if job.poll():
+                        selector.unregister(job.fd)
+                        job.close()
+                        pending.remove(job)
+                        yield job
+
+    def play_game(self, player_locs, **kwargs):
+        """
+        Play one game between players loaded from `player_locs` (in colour
+        order) in a forked child process, and return the outcome (see
+        `play_quiet_game`).
+        """
+        return self.run(play_quiet_game, player_locs, **kwargs)
+
+
+class _Job:
+    """A handle on the result of a function running in a child process."""
+    def __init__(self, pid, fd):
+        self.pid = pid
+        self.fd = fd
+        self._chunks = []
+        self._payload = None
+
+    @classmethod
+    def run_inline(cls, fn, args, kwargs):
+        job = cls(None, None)
+        try:
+            job._payload = (True, fn(*args, **kwargs))
+        except Exception as e:
+            job._payload = (False, e)
+        return job
+
+    def done(self):
+        return self._payload is not None
+
+    def poll(self):
+        """
+        Read whatever is available from the child. Return True once the
+        child has finished (closed its end of the pipe).
+        """
+        chunk = os.read(self.fd, 1 << 16)
+        if chunk:
+            self._chunks.append(chunk)
+            return False
+        data = b"".join(self._chunks)
+        self._chunks = []
+        if data:
+            self._payload = pickle.loads(data)
+        else:
+            self._payload = (False, ChildProcessError(
+                f"child process {self.pid} exited without a result"))
+        return True
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+        if self.pid is not None:
+            os.waitpid(self.pid, 0)
+            self.pid = None
+
+    def cancel(self):
+        """Stop the child process (if it is still running)."""
+        if self.pid is not None and not self.done():
+            os.kill(self.pid, signal.SIGKILL)
+            self._payload = (False, ChildProcessError(
+                f"child process {self.pid} was cancelled"))
+        self.close()
+
+    def result(self):
+        """Wait for the job to finish, then return its result (or raise)."""
+        while not self.done():
+            self.poll()
+        self.close()
+        ok, value = self._payload
+        if ok:
+            return value
+        raise value
+
+
+def _reseed_random():
+    """
+    Give a child process fresh random number generators (otherwise every
+    child would inherit, and repeat, the parent's random sequence).
+    """
+    random.seed()
+    numpy = sys.modules.get("numpy")
+    if numpy is not None:
+        numpy.random.seed()
+
+def _seed_random(seed):
+    """Seed the random number generators (for a repeatable game)."""
+    random.seed(seed)
+    numpy = sys.modules.get("numpy")
+    if numpy is not None:
+        numpy.random.seed(seed % 2**32)
+
+def _picklable_exception(e):
+    """Make sure an exception can be sent back from a child process."""
+    try:
+        pickle.dumps(e)
+        return e
+    except Exception:
+        return ChildProcessError("".join(
+            traceback.format_exception(type(e), e, e.__traceback__)))
+
+
+def play_quiet_game(player_locs, time_limit=None, space_limit=None,
+        logfilename=None, seed=None, publisher=None, memory_profile=0,
+        logfn=None):
+    """
+    Play a game without any commentary and return the outcome as a tuple
+    (winner, result), where `winner` is the index of the winning location in
+    `player_locs` (0 for White, 1 for Black) or None for a draw, and `result`
+    is a string describing the result. If `seed` is given, the random number
+    generators are seeded with it before the players are created. If
+    `publisher` is given, the game's positions are published to it (see
+    `referee.snapshots`). If `memory_profile` is positive, the players'
+    memory allocations are traced, and reported after the game (listing this
+    many source lines) one line at a time to `logfn`.
+
+    A player whose action is illegal, who exceeds their own time limit, or
+    whose code raises an exception, loses the game. If the players exceed
+    their (shared) space limit, the game is counted as a draw.
+    """
+    if seed is not None:
+        _seed_random(seed)
+    players = [PlayerWrapper(f'player {num}', loc,
+            time_limit=time_limit, space_limit=space_limit,
+            memory_profile=memory_profile)
+        for num, loc in enumerate(player_locs, 1)]
+    try:
+        result = play(players, logfilename=logfilename, print_state=False,
+            publisher=publisher)
+    except IllegalActionException as e:
+        offender = str(e).split()[0]
+        return 1 - COLOURS.index(offender), \
+            f"error: invalid action by {offender}"
+    except ResourceLimitException as e:
+        for num, player in enumerate(players):
+            if str(e).startswith(player.timer.name):
+                return 1 - num, f"error: resource limit exceeded ({e})"
+        return None, f"error: resource limit exceeded ({e})"
+    except Exception as e:
+        num = _crashed_player(players, e)
+        if num is None:
+            raise # (not from a player: a bug in the referee)
+        return 1 - num, f"error: {players[num].colour} crashed ({e!r})"
+    finally:
+        if logfn is not None:
+            for player in players:
+                for line in player.memory_report():
+                    logfn(line)
+    if result.startswith("winner: "):
+        return COLOURS.index(result.split()[-1]), result
+    return None, result
+
+def _crashed_player(players, e):
+    """
+    Find the index of the player whose init, action or update call raised
+    exception `e` (from its traceback), or None if no player's call did.
+    """
+    tb = e.__traceback__
+    while tb is not None:
+        frame = tb.tb_frame
+        if frame.f_code in _WRAPPER_CODE:
+            for num, player in enumerate(players):
+                if frame.f_locals.get("self") is player:
+                    return num
+        tb = tb.tb_next
+    return None
+
+_WRAPPER_CODE = {PlayerWrapper.init.__code__,
+    PlayerWrapper.action.__code__, PlayerWrapper.update.__code__}
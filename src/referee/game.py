@@ -17,6 +17,10 @@ import sys
 import time
 from collections import Counter
 
+from referee.log import LogSink
+from referee import codec
+from referee.clusters import ClusterIndex
+
 
 
 # Game-specific constants for use in other modules:
@@ -31,7 +35,8 @@ NUM_PLAYERS = 2
 
 def play(players,
          delay=0, logfilename=None, out_function=None, print_state=True,
-         use_debugboard=False, use_colour=False, use_unicode=False):
+         use_debugboard=False, use_colour=False, use_unicode=False,
+         renderer=None, publisher=None):
     """
     Coordinate a game, return a string describing the result.
 
@@ -47,6 +52,11 @@ def play(players,
         state is also True).
     use_colour -- Use ANSI colour codes for output.
     use_unicode -- Use unicode symbols for output.
+    renderer -- If not None, a board renderer (see `referee.render`) to use
+        for printing the board after each update (if print_state is also
+        True), in place of out_function.
+    publisher -- If not None, a snapshot channel (see `referee.snapshots`)
+        to publish the position to after each update, for spectators.
     """
     # Configure behaviour of this function depending on parameters:
     out = out_function if out_function else (lambda *_, **__: None) # no-op
@@ -58,29 +68,56 @@ def play(players,
             input()
     else:
         def wait(): pass
-    if print_state:
+    if print_state and renderer is not None:
+        def display_state(game):
+            renderer.draw(game)
+    elif print_state:
         def display_state(game):
             out("displaying game info:")
             out(game, depth=1)
     else:
         def display_state(game): pass
+    if publisher is not None:
+        # (publish every position displayed: the first, and each update's)
+        def display_state(game, display_state=display_state):
+            publisher.publish(game)
+            display_state(game)
 
     # Set up a new game and initialise the players (constructing the
     # Player classes including running their .__init__() methods).
     game = Game(logfilename=logfilename, debugboard=use_debugboard,
                 colourboard=use_colour, unicodeboard=use_unicode)
-    out("initialising players", depth=-1)
-    for player, colour in zip(players, COLOURS):
-        # NOTE: `player` here is actually a player wrapper. Your program should
-        # still implement a method called `__init__()`, not one called `init()`.
-        player.init(colour)
-
-    # Display the initial state of the game.
-    out("game start!", depth=-1)
-    display_state(game)
-
-    # Repeat the following until the game ends
-    # (starting with White as the current player, then alternating):
+    if publisher is not None:
+        publisher.start()
+    try:
+        out("initialising players", depth=-1)
+        for player, colour in zip(players, COLOURS):
+            # NOTE: `player` here is actually a player wrapper. Your program
+            # should still implement a method called `__init__()`, not one
+            # called `init()`.
+            player.init(colour)
+
+        # Display the initial state of the game.
+        out("game start!", depth=-1)
+        display_state(game)
+
+        # Repeat the following until the game ends
+        # (starting with White as the current player, then alternating):
+        _play_turns(game, players, wait, out, display_state)
+    except BaseException as e:
+        # The game is ending early (e.g. a player exceeded a resource limit),
+        # but make sure the log records why, and is completely written.
+        game._log("error", f"game aborted: {e!r}")
+        game._end_log()
+        if publisher is not None:
+            publisher.publish(game, aborted=True)
+        raise
+
+    # After that loop, the game has ended (one way or another!)
+    return game.end()
+
+def _play_turns(game, players, wait, out, display_state):
+    """Run the main loop of `play` until the game is over."""
     curr_player, next_player = players
     while not game.over():
         wait()
@@ -103,9 +140,6 @@ def play(players,
         # Next player's turn!
         curr_player, next_player = next_player, curr_player
 
-    # After that loop, the game has ended (one way or another!)
-    return game.end()
-
 
 
 
@@ -131,6 +165,8 @@ def _NEAR_SQUARES(square):
             (x-1,y-1),(x,y-1),(x+1,y-1)} & _ALL_SQUARES
 
 _MAX_TURNS = 250 # per player
+
+_TEMPLATE_SQUARES = [(x,7-y) for y in range(8) for x in range(8)]
  
 
 
@@ -152,19 +188,13 @@ class Game:
         self.score = {'white': 12, 'black': 12}
         self.drawmsg = ""
         self.nturns  = 0
-        self.history = Counter({self._snap(): 1})
+        self.position = self._snap() # (as of the last update)
+        self.history = Counter({self.position: 1})
+        # and the groups of stacks that would explode together
+        self.clusters = ClusterIndex(self.board)
 
         # when we print the board, should we show coordinates?
-        if debugboard:
-            if unicodeboard:
-                self.board_template = _BOARD_TEMPLATE_UNICODE_DEBUG
-            else:
-                self.board_template = _BOARD_TEMPLATE_ASCII_DEBUG
-        else:
-            if unicodeboard:
-                self.board_template = _BOARD_TEMPLATE_UNICODE_SMALL
-            else:
-                self.board_template = _BOARD_TEMPLATE_ASCII_SMALL
+        self.board_template = _BOARD_TEMPLATE(debugboard, unicodeboard)
         # and should we use colour?
         if colourboard:
             self.white_stack_template = _STACK_TEMPLATE_WHITE_COLOUR
@@ -175,7 +205,9 @@ class Game:
 
         # and we might like to log actions!
         if logfilename is not None:
-            self._logfile = open(logfilename, 'w', 1)
+            # (lines are written to the file by a background thread, so that
+            # game turns never wait on the disk)
+            self._logfile = LogSink(open(logfilename, 'w'), close_file=True)
             self._log("game", "Start game log at", time.asctime())
         else:
             self._logfile = None
@@ -204,19 +236,17 @@ class Game:
         atype, *aargs = action
         if atype == "MOVE":
             n, a, b = aargs
+            self.clusters.move(a, b, n)
             n = -n if self.board[a] < 0 else n
             self.board[a] -= n
             self.board[b] += n
         else: # atype == "BOOM":
             start_square, = aargs
-            to_boom = [start_square]
-            for boom_square in to_boom:
-                n = self.board[boom_square]
-                self.score["white" if n > 0 else "black"] -= abs(n)
+            cluster = self.clusters.boom(start_square)
+            self.score["white"] -= cluster.white
+            self.score["black"] -= cluster.black
+            for boom_square in cluster.squares:
                 self.board[boom_square] = 0
-                for near_square in _NEAR_SQUARES(boom_square):
-                    if self.board[near_square] != 0:
-                        to_boom.append(near_square)
         self._log(colour, _FORMAT_ACTION(action))
         self._turn_detect_draw()
         # TODO: return a sanitised version of the action?
@@ -251,7 +281,7 @@ class Game:
         if self.nturns >= _MAX_TURNS * 2:
             self.drawmsg = "maximum number of turns reached."
         
-        state = self._snap()
+        self.position = state = self._snap()
         self.history[state] += 1
         if self.history[state] >= 4:
             self.drawmsg = "game state occurred 4 times."
@@ -261,12 +291,9 @@ class Game:
         Capture the current board state in a hashable way
         (for repeated-state checking)
         """
-        return (
-            # same colour tokens in the same positions
-            tuple((sq,n) for sq,n in self.board.items() if n),
-            # on the same player's turn
-            self.nturns % 2,
-        )
+        # same colour tokens in the same positions, on the same player's turn
+        # (but not counting the number of turns, which never repeats)
+        return codec.encode(self.board, side=self.nturns % 2)
 
 
     def over(self):
@@ -300,24 +327,34 @@ class Game:
 
     def __str__(self):
         """Create and return a representation of board for printing."""
-        coords = [(x,7-y) for y in range(8) for x in range(8)] # template order
+        return self.board_template.format(self._score_str(), *self._cells())
+
+    def _score_str(self):
+        return "white: {white}, black: {black}".format(**self.score)
+
+    def _cells(self):
+        """
+        Format each square of the board (in the order they appear in the
+        board template, i.e. by row from the top, then by column).
+        """
         cells = []
-        for square in coords:
+        for square in _TEMPLATE_SQUARES:
             n = self.board[square]
             if n > 0:
                 cells.append(self.white_stack_template.format(n=n))
-            elif self.board[square] < 0:
+            elif n < 0:
                 cells.append(self.black_stack_template.format(n=-n))
             else: # n == 0:
                 cells.append("   ")
-        score_str = "white: {white}, black: {black}".format(**self.score)
-        return self.board_template.format(score_str, *cells)
+        return cells
 
     def _log(self, header, *messages):
         """Helper method to add a message to the logfile"""
         if self._logfile is not None:
-            print(f"[{header:5s}] -", *messages, file=self._logfile, flush=True)
+            line = " ".join([f"[{header:5s}] -", *map(str, messages)])
+            self._logfile.write(line + "\n")
     def _end_log(self):
+        """Write out any remaining lines of the logfile, and close it."""
         if self._logfile is not None:
             self._logfile.close()
             self._logfile = None
@@ -437,6 +474,18 @@ board:
 | 0,0 | 1,0 | 2,0 | 3,0 | 4,0 | 5,0 | 6,0 | 7,0 |  B: 11
 +-----+-----+-----+-----+-----+-----+-----+-----+  C: 12"""
 
+def _BOARD_TEMPLATE(debugboard, unicodeboard):
+    if debugboard:
+        if unicodeboard:
+            return _BOARD_TEMPLATE_UNICODE_DEBUG
+        else:
+            return _BOARD_TEMPLATE_ASCII_DEBUG
+    else:
+        if unicodeboard:
+            return _BOARD_TEMPLATE_UNICODE_SMALL
+        else:
+            return _BOARD_TEMPLATE_ASCII_SMALL
+
 def _FORMAT_ACTION(action):
     atype, *aargs = action
     if atype == "MOVE":
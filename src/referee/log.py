@@ -3,16 +3,27 @@ Helper module, simplifying configurable-verbosity logging
 with uniform formatting accross multiple parts of a program
 """
 
+import os
 import sys
+import time
+import queue
+import weakref
+import threading
 
 class StarLog:
     def __init__(self, level=1, file=sys.stdout, timefn=None,
-                star='*', pad='  ', ansi=False):
+                star='*', pad='  ', ansi=False, buffered=False):
         self.level = level
         self.timefn = timefn
         self.star = star
         self.pad = pad
-        self.kwargs = {"file": file, "flush": True}
+        if buffered:
+            # hand lines to a background writer, which flushes in batches
+            self.sink = LogSink(file)
+            self.kwargs = {"file": self.sink}
+        else:
+            self.sink = None
+            self.kwargs = {"file": file, "flush": True}
         if ansi:
             self.clear = "\033[H\033[2J" # ANSI code to clear the terminal
         else:   
@@ -54,3 +65,126 @@ class StarLog:
     def debug(self, *args, **kwargs):
         """Shortcut to log at level 2 (debug)."""
         self.log(*args, level=2, **kwargs)
+
+    def flush(self):
+        """Wait until all messages logged so far have been written."""
+        if self.sink is not None:
+            self.sink.flush()
+
+    def close(self):
+        """Write any remaining messages and stop the background writer."""
+        if self.sink is not None:
+            self.sink.close()
+
+
+_CLOSE = object() # (sentinel asking a LogSink's writer thread to stop)
+
+class LogSink:
+    """
+    A write-only file-like object that hands text over to a background thread
+    to write to an underlying file in batches, so that writers never wait for
+    the disk (or terminal) themselves.
+
+    Buffered text is written (and the file flushed) when more than
+    `max_size` characters are waiting, when the oldest waiting text is more
+    than `max_delay` seconds old, when `flush()` is called (this waits for
+    the writing to finish), and when the sink is closed.
+
+    Every open sink is flushed before the process forks. A forked child has
+    no writer thread, so its sinks write text straight to the file instead.
+    Writing to a closed sink raises ValueError, as for a closed file.
+    """
+    def __init__(self, file, max_size=8192, max_delay=0.5, close_file=False):
+        self.file = file
+        self.max_size = max_size
+        self.max_delay = max_delay
+        self.close_file = close_file
+        self.closed = False
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._drain, daemon=True,
+            name="LogSink")
+        self._thread.start()
+        _sinks.add(self)
+
+    def write(self, text):
+        if self.closed:
+            raise ValueError("write to closed LogSink")
+        if not text:
+            return 0
+        if self._thread.is_alive():
+            self._queue.put(text)
+        else:
+            # (no writer thread, as in a forked child: write it ourselves)
+            self.file.write(text)
+            self.file.flush()
+        return len(text)
+
+    def flush(self):
+        if self.closed:
+            return
+        if not self._thread.is_alive():
+            self.file.flush()
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        _sinks.discard(self)
+        if self._thread.is_alive():
+            self._queue.put(_CLOSE)
+            self._thread.join()
+        if self.close_file:
+            self.file.close()
+
+    def _drain(self):
+        """Writer thread: collect text from the queue and write in batches."""
+        buffer = []
+        size = 0
+        deadline = None
+        while True:
+            if deadline is None:
+                item = self._queue.get()
+            else:
+                try:
+                    item = self._queue.get(
+                        timeout=max(0, deadline - time.monotonic()))
+                except queue.Empty:
+                    item = None # (time is up)
+            if isinstance(item, str):
+                buffer.append(item)
+                size += len(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.max_delay
+                if size < self.max_size:
+                    continue
+            # otherwise, it's time to write out the buffer
+            try:
+                if buffer:
+                    self.file.write("".join(buffer))
+                    self.file.flush()
+            except (OSError, ValueError):
+                pass # (nowhere left to report the problem)
+            finally:
+                buffer = []
+                size = 0
+                deadline = None
+                if isinstance(item, threading.Event):
+                    item.set()
+            if item is _CLOSE:
+                return
+
+# Make sure every writer is idle (and holds no locks) whenever the process
+# forks, or the child could inherit a half-written file. (The hook is
+# registered once, for all sinks, since hooks can never be unregistered.)
+_sinks = weakref.WeakSet()
+
+def _flush_sinks():
+    for sink in list(_sinks):
+        sink.flush()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(before=_flush_sinks)
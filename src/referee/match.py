@@ -0,0 +1,248 @@
+"""
+Play a head-to-head match between two Player classes, stopping as soon as
+the result is statistically clear.
+
+Games alternate colours and are played in parallel (each in a process forked
+from a fork server; see `referee.forkserver`). After each game, a sequential
+probability ratio test (SPRT) compares two hypotheses about how much
+stronger the first player is than the second, in Elo:
+
+    H0: the difference is elo0  vs  H1: the difference is elo1
+
+The match stops when either hypothesis is accepted (with false positive rate
+alpha and false negative rate beta), or when the maximum number of games has
+been played. The Elo difference is then estimated, with a confidence
+interval.
+
+Usage:
+    python -m referee.match [options] player_a player_b
+(run with --help for a list of options).
+"""
+
+import os
+import math
+import argparse
+
+from referee.log import StarLog
+from referee.options import PackageSpecAction, PKG_SPEC_HELP
+from referee.forkserver import ForkServer, play_quiet_game
+
+PROGRAM = "python -m referee.match"
+DESCRIP = "play a head-to-head match between 2 Player classes, stopping " \
+    "early once a sequential probability ratio test decides the result."
+
+class SPRT:
+    """
+    Track the results of a match and test whether the first player is
+    stronger than the second by elo0 or elo1, using the (normal
+    approximation to the) generalised sequential probability ratio test
+    on game scores (win 1, draw 1/2, loss 0).
+    """
+    def __init__(self, elo0=0.0, elo1=10.0, alpha=0.05, beta=0.05):
+        self.elo0 = elo0
+        self.elo1 = elo1
+        self.score0 = elo_to_score(elo0)
+        self.score1 = elo_to_score(elo1)
+        self.lower = math.log(beta / (1 - alpha))
+        self.upper = math.log((1 - beta) / alpha)
+        self.wins = self.draws = self.losses = 0
+
+    def add(self, score):
+        """Record a game result (1, 0.5 or 0) for the first player."""
+        if score == 1:
+            self.wins += 1
+        elif score == 0:
+            self.losses += 1
+        else:
+            self.draws += 1
+
+    @property
+    def games(self):
+        return self.wins + self.draws + self.losses
+
+    def mean_and_variance(self):
+        """
+        The mean score per game, and the variance of a game's score. (The
+        variance is estimated as if there had also been half a win, half a
+        draw and half a loss, so that it is never zero: otherwise a match
+        of nothing but wins would never be decided.)
+        """
+        n = self.games
+        mean = (self.wins + self.draws/2) / n
+        wins, draws, losses = self.wins+0.5, self.draws+0.5, self.losses+0.5
+        smoothed = (wins + draws/2) / (n + 1.5)
+        variance = (wins * (1 - smoothed)**2 + draws * (0.5 - smoothed)**2
+            + losses * smoothed**2) / (n + 1.5)
+        return mean, variance
+
+    def llr(self):
+        """The log-likelihood ratio of H1 against H0, so far."""
+        if self.games == 0:
+            return 0.0
+        mean, variance = self.mean_and_variance()
+        return (self.score1 - self.score0) \
+            * (2*mean - self.score0 - self.score1) * self.games / (2*variance)
+
+    def status(self):
+        """Return "H1" or "H0" if that hypothesis is accepted, else None."""
+        llr = self.llr()
+        if llr >= self.upper:
+            return "H1"
+        if llr <= self.lower:
+            return "H0"
+        return None
+
+    def elo(self, confidence=0.95):
+        """
+        Estimate the Elo difference, returning a tuple (estimate, low, high)
+        where (low, high) is a confidence interval.
+        """
+        mean, variance = self.mean_and_variance()
+        z = _normal_quantile(0.5 + confidence/2)
+        margin = z * math.sqrt(variance / self.games)
+        return (score_to_elo(mean), score_to_elo(mean - margin),
+            score_to_elo(mean + margin))
+
+def elo_to_score(elo):
+    """The expected score of a player `elo` points stronger than another."""
+    return 1 / (1 + 10**(-elo/400))
+
+def score_to_elo(score):
+    """The Elo difference corresponding to an expected score."""
+    if score <= 0:
+        return -math.inf
+    if score >= 1:
+        return math.inf
+    return -400 * math.log10(1/score - 1)
+
+def _normal_quantile(p):
+    """The inverse of the standard normal CDF (by bisection)."""
+    low, high = -10.0, 10.0
+    for _ in range(100):
+        mid = (low + high) / 2
+        if 0.5 * math.erfc(-mid / math.sqrt(2)) < p:
+            low = mid
+        else:
+            high = mid
+    return (low + high) / 2
+
+
+def run_match(player_a, player_b, sprt, max_games=1000, jobs=1,
+        time_limit=None, space_limit=None, logfn=None, server=None):
+    """
+    Play games between `player_a` and `player_b` (package specifications,
+    as (package, class) tuples), alternating colours and running up to
+    `jobs` games at once, until `sprt` accepts a hypothesis or `max_games`
+    games have been played. Return the SPRT's status ("H0", "H1" or None).
+    A player who breaks the rules, runs out of time or crashes loses that
+    game (see `forkserver.play_quiet_game`), and the match goes on.
+    """
+    log = logfn if logfn else (lambda *_, **__: None) # no-op
+    if server is None:
+        server = ForkServer([player_a, player_b], logfn=log)
+    running = {}
+    started = 0
+    try:
+        while True:
+            # keep up to `jobs` games running
+            while len(running) < jobs and started < max_games:
+                # (player a takes white in even-numbered games)
+                a_colour = started % 2
+                locs = [player_a, player_b] if a_colour == 0 \
+                    else [player_b, player_a]
+                job = server.submit(play_quiet_game, locs,
+                    time_limit=time_limit, space_limit=space_limit)
+                running[job] = (started, a_colour)
+                started += 1
+            if not running:
+                return sprt.status()
+            job = next(server.as_completed(list(running)))
+            num, a_colour = running.pop(job)
+            winner, result = job.result()
+            if winner is None:
+                score = 0.5
+            else:
+                score = 1 if winner == a_colour else 0
+            sprt.add(score)
+            log(f"game {num+1} (player a as {('white', 'black')[a_colour]}): "
+                f"{result}; W/D/L {sprt.wins}/{sprt.draws}/{sprt.losses}, "
+                f"LLR {sprt.llr():.3f} [{sprt.lower:.3f}, {sprt.upper:.3f}]",
+                depth=1)
+            status = sprt.status()
+            if status is not None:
+                return status
+    finally:
+        for job in running:
+            job.cancel()
+
+
+def get_options():
+    """Parse and return command-line arguments for a match."""
+    parser = argparse.ArgumentParser(prog=PROGRAM, description=DESCRIP,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    positionals = parser.add_argument_group(
+        title="player package/class specifications (positional arguments)",
+        description=PKG_SPEC_HELP)
+    positionals.add_argument('player_a', action=PackageSpecAction,
+        help="location of the first (e.g. new) Player class")
+    positionals.add_argument('player_b', action=PackageSpecAction,
+        help="location of the second (e.g. old) Player class")
+    parser.add_argument('--elo0', type=float, default=0.0,
+        help="Elo difference under the null hypothesis (default: "
+        "%(default)s).")
+    parser.add_argument('--elo1', type=float, default=10.0,
+        help="Elo difference under the alternative hypothesis (default: "
+        "%(default)s).")
+    parser.add_argument('--alpha', type=float, default=0.05,
+        help="false positive rate (default: %(default)s).")
+    parser.add_argument('--beta', type=float, default=0.05,
+        help="false negative rate (default: %(default)s).")
+    parser.add_argument('-n', '--max-games', type=int, default=1000,
+        help="stop after this many games if still undecided (default: "
+        "%(default)s).")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(),
+        help="number of games to play at once (default: number of CPUs, "
+        "%(default)s).")
+    parser.add_argument('-s', '--space', metavar="space_limit", type=float,
+        default=0, help="limit on memory space (float, MB) for each player.")
+    parser.add_argument('-t', '--time', metavar="time_limit", type=float,
+        default=0, help="limit on CPU time (float, seconds) for each player.")
+    parser.add_argument('-v', '--verbosity', type=int, choices=range(0, 3),
+        default=1, help="0: only the final result; 1: (default) summary; "
+        "2: also each game's result.")
+    return parser.parse_args()
+
+def main():
+    options = get_options()
+    out = StarLog(level=options.verbosity)
+    sprt = SPRT(options.elo0, options.elo1, options.alpha, options.beta)
+    out.comment(f"testing H0: elo = {options.elo0} vs H1: elo = "
+        f"{options.elo1} (alpha = {options.alpha}, beta = {options.beta})")
+    try:
+        status = run_match(options.player_a, options.player_b, sprt,
+            max_games=options.max_games, jobs=max(1, options.jobs),
+            time_limit=options.time, space_limit=options.space,
+            logfn=lambda *args, depth=0: out.debug(*args, depth=depth))
+    except KeyboardInterrupt:
+        print() # (end the line)
+        out.comment("bye!")
+        status = None
+    if sprt.games == 0:
+        return
+    elo, low, high = sprt.elo()
+    out.comment("match over!", depth=-1)
+    if status == "H1":
+        out.print(f"H1 accepted: player a is stronger (by about "
+            f"{options.elo1} Elo or more)")
+    elif status == "H0":
+        out.print(f"H0 accepted: player a is not stronger by "
+            f"{options.elo1} Elo")
+    else:
+        out.print("undecided")
+    out.print(f"games: {sprt.games} (W/D/L {sprt.wins}/{sprt.draws}/"
+        f"{sprt.losses}), LLR: {sprt.llr():.3f}")
+    out.print(f"elo: {elo:.1f} (95% confidence interval {low:.1f} to "
+        f"{high:.1f})")
+
+if __name__ == '__main__':
+    main()
@@ -4,7 +4,8 @@ Provide a command-line argument parsing function using argparse
 
 --------------------------------------------------------------------------------
 usage: referee [-h] [-V] [-d [delay]] [-s [space_limit]] [-t [time_limit]]
-               [-D | -v [{0,1,2,3}]] [-l [LOGFILE]] [-c | -C] [-u | -a]
+               [-D | -v [{0,1,2,3}]] [-l [LOGFILE]] [-n [games]] [-m [lines]]
+               [-p [NAME]] [-r] [-c | -C] [-u | -a]
                white black
 
 conducts a game of Expendibots between 2 Player classes.
@@ -52,6 +53,34 @@ optional arguments:
                         if you supply this flag the referee will create a log of
                         all game actions in a text file named LOGFILE (default:
                         game.log).
+  -n [games], --games [games]
+                        play this many games in a row (default: 1). each game
+                        is played in a fresh process forked from a referee
+                        that has already loaded both players (where
+                        supported). only the results are displayed (with -l,
+                        each game is logged to its own numbered file, e.g.
+                        game-1.log; to watch the games, publish them with -p
+                        and follow them with `python -m referee.snapshots
+                        --grid`).
+  -m [lines], --memory-profile [lines]
+                        trace each player's memory allocations (with
+                        tracemalloc, which slows the players down) and, after
+                        the game, report how much memory each player's init,
+                        action and update calls allocated, and which lines of
+                        player code hold the most memory (list this many
+                        lines; default: 10).
+  -p [NAME], --publish [NAME]
+                        publish the position after each turn in a shared
+                        memory block named NAME (default: a name made from the
+                        referee's process id), for other processes to follow
+                        the game(s) (see `python -m referee.snapshots`).
+  -r, --redraw          keep the board display at the top of the terminal and
+                        redraw only the squares that change after each turn,
+                        instead of reprinting the whole board (uses ANSI
+                        control sequences). this shows a single game; to show
+                        several games at once in a grid of boards, publish
+                        them with -p and follow them with `python -m
+                        referee.snapshots --grid`.
   -c, --colour          force colour display using ANSI control sequences
                         (default behaviour is automatic based on system).
   -C, --colourless      force NO colour display (see -c).
@@ -99,6 +128,15 @@ VERBOSITY_NOVALUE = 3 # highest level, debug board
 LOGFILE_DEFAULT = None
 LOGFILE_NOVALUE = "game.log"
 
+GAMES_DEFAULT = 1
+GAMES_NOVALUE = 10
+
+MEMPROF_DEFAULT = 0
+MEMPROF_NOVALUE = 10
+
+PUBLISH_DEFAULT = None
+PUBLISH_NOVALUE = "" # signifying a name made from the referee's process id
+
 PKG_SPEC_HELP = """
 The first {} arguments are 'package specifications'. These specify which Python
 package/module to import and search for a class named 'Player' (to instantiate
@@ -178,6 +216,43 @@ def get_options():
         help="if you supply this flag the referee will create a log of all "
         "game actions in a text file named %(metavar)s (default: %(const)s).")
 
+    optionals.add_argument('-n', '--games', metavar="games",
+        type=int, nargs='?',
+        default=GAMES_DEFAULT, const=GAMES_NOVALUE,
+        help="play this many games in a row (default: %(default)s). each "
+        "game is played in a fresh process forked from a referee that has "
+        "already loaded both players (where supported). only the results are "
+        "displayed (with -l, each game is logged to its own numbered file, "
+        "e.g. game-1.log; to watch the games, publish them with -p and "
+        "follow them with `python -m referee.snapshots --grid`).")
+
+    optionals.add_argument('-m', '--memory-profile', metavar="lines",
+        type=int, nargs='?',
+        default=MEMPROF_DEFAULT, const=MEMPROF_NOVALUE,
+        help="trace each player's memory allocations (with tracemalloc, "
+        "which slows the players down) and, after the game, report how much "
+        "memory each player's init, action and update calls allocated, and "
+        "which lines of player code hold the most memory (list this many "
+        "lines; default: %(const)s).")
+
+    optionals.add_argument('-p', '--publish', metavar="NAME",
+        type=str, nargs='?',
+        default=PUBLISH_DEFAULT, const=PUBLISH_NOVALUE,
+        help="publish the position after each turn in a shared memory block "
+        "named %(metavar)s (default: a name made from the referee's process "
+        "id), "
+        "for other processes to follow the game(s) (see `python -m "
+        "referee.snapshots`).")
+
+    optionals.add_argument('-r', '--redraw',
+        action="store_true",
+        help="keep the board display at the top of the terminal and redraw "
+        "only the squares that change after each turn, instead of reprinting "
+        "the whole board (uses ANSI control sequences). this shows a single "
+        "game; to show several games at once in a grid of boards, publish "
+        "them with -p and follow them with `python -m referee.snapshots "
+        "--grid`.")
+
     colour_group = optionals.add_mutually_exclusive_group()
     colour_group.add_argument('-c', '--colour',
         action="store_true",
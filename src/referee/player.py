@@ -5,10 +5,17 @@ being executed, etc.
 """
 
 import gc
+import os
+import sys
 import time
+import signal
+import threading
+import inspect
 import importlib
+import tracemalloc
 
 from referee.game import NUM_PLAYERS
+from referee.budget import Budget
 
 class PlayerWrapper:
     """
@@ -16,16 +23,19 @@ class PlayerWrapper:
     * Wrapper constructor attempts to import the Player class by name.
     * `.init()` method constructs the Player instance (calling `.__init__()`)
     * `.action()` and `.update()` methods just delegate to the real Player's
-      methods of the same name.
-    Each method enforces resource limits on the real Player's computation.
+      methods of the same name (if the real Player's `.action()` method
+      accepts an argument, it is given a `referee.budget.Budget`).
+    Each method enforces resource limits on the real Player's computation,
+    and (if `memory_profile` is positive) tracks the memory it allocates.
     """
     def __init__(self, name, player_loc, time_limit=None, space_limit=None,
-            logfn=None):
+            logfn=None, memory_profile=0):
         self.log = logfn if logfn else (lambda *_, **__: None) # no-op
         self.name = name
         
         # create some context managers for resource limiting
         self.timer = _CountdownTimer(time_limit, self.name)
+        self.space_limit = space_limit
         if space_limit is not None: space_limit *= NUM_PLAYERS
         self.space = _MemoryWatcher(space_limit)
         
@@ -35,35 +45,55 @@ class PlayerWrapper:
             f"from package '{player_pkg}'")
         self.Player = _load_player_class(player_pkg, player_cls)
 
+        # and, optionally, one for memory profiling
+        self.profiler = _AllocationProfiler(self.Player, memory_profile)
+
     def init(self, colour):
         self.colour = colour
         self.name += f' ({colour})'
         player_cls = str(self.Player).strip('<class >')
         self.log(f"initialising {self.colour} player as a {player_cls}")
-        with self.space, self.timer:
+        with self.profiler("init"), self.space, self.timer:
             # construct/initialise the player class
             self.player = self.Player(colour)
         self.log(self.timer.status(), depth=1)
         self.log(self.space.status(), depth=1)
+        self.log(self.profiler.status(), depth=1)
+        self.turns = 0
+        self.wants_budget = _accepts_argument(self.player.action)
 
     def action(self):
         self.log(f"asking {self.name} for next action...")
-        with self.space, self.timer:
+        self.turns += 1
+        with self.profiler("action"), self.space, self.timer:
             # ask the real player
-            action = self.player.action()
+            if self.wants_budget:
+                budget = Budget(self.timer, self.turns, self.space_limit)
+                action = self.player.action(budget)
+            else:
+                action = self.player.action()
         self.log(f"{self.name} returned action: {action!r}", depth=1)
         self.log(self.timer.status(), depth=1)
         self.log(self.space.status(), depth=1)
+        self.log(self.profiler.status(), depth=1)
         # give back the result
         return action
 
     def update(self, colour, action):
         self.log(f"updating {self.name} with {colour}'s action {action}...")
-        with self.space, self.timer:
+        with self.profiler("update"), self.space, self.timer:
             # forward to the real player
             self.player.update(colour, action)
         self.log(self.timer.status(), depth=1)
         self.log(self.space.status(), depth=1)
+        self.log(self.profiler.status(), depth=1)
+
+    def memory_report(self):
+        """
+        Summarise the memory allocated by this player during the game so far
+        (if memory profiling is enabled), as a list of lines.
+        """
+        return self.profiler.report(self.name)
 
 def _load_player_class(package_name, class_name):
     """
@@ -73,6 +103,17 @@ def _load_player_class(package_name, class_name):
     player_class = getattr(module, class_name)
     return player_class
 
+def _accepts_argument(method):
+    """
+    Check whether a (bound) method can be called with one positional
+    argument.
+    """
+    try:
+        inspect.signature(method).bind(None)
+        return True
+    except (TypeError, ValueError):
+        return False
+
 
 # RESOURCE MANAGEMENT
 
@@ -87,6 +128,9 @@ class _CountdownTimer:
     * measures CPU time, not wall-clock time
     * unless time_limit is 0, throws an exception upon exiting the context after
       the allocated time has passed
+    * where possible (on Unix, in the main thread), also throws the exception
+      from inside the context as soon as the time runs out, using a CPU-time
+      alarm (SIGPROF), repeating every so often in case it is caught
     """
     def __init__(self, time_limit, name):
         """
@@ -96,30 +140,82 @@ class _CountdownTimer:
         self.name  = name
         self.limit = time_limit
         self.clock = 0
+        self.start = None # (while timing, when timing started)
+        self._armed = False # (whether the alarm is set)
+        self._old_handler = None
         self._status = ""
     def _set_status(self, status):
         self._status = status
     def status(self):
         return self._status
+
+    def elapsed(self):
+        """Total time counted so far (including any time still running)."""
+        if self.start is None:
+            return self.clock
+        return self.clock + (time.process_time() - self.start)
     
     def __enter__(self):
         # clean up memory off the clock
         gc.collect()
         # then start timing
         self.start = time.process_time()
+        # (if arming is interrupted, __exit__ won't run to disarm)
+        try:
+            self._arm()
+        except BaseException:
+            self._disarm()
+            self.start = None
+            raise
         return self # unused
     
     def __exit__(self, exc_type, exc_val, exc_tb):
+        self._disarm()
         # accumulate elapsed time since __enter__
         elapsed = time.process_time() - self.start
         self.clock += elapsed
+        self.start = None
         self._set_status(f"time:  +{elapsed:6.3f}s  (just elapsed)  "
             f"{self.clock:7.3f}s  (game total)")
 
         # if we are limited, let's hope we aren't out of time!
+        # (if the alarm already went off, let its exception continue)
+        if exc_type is ResourceLimitException:
+            return
         if self.limit is not None and self.limit > 0 and self.clock > self.limit:
             raise ResourceLimitException(f"{self.name} exceeded available time")
 
+    def _arm(self):
+        """Set an alarm to go off when the remaining CPU time is used up."""
+        if not _PREEMPT_ENABLED or self.limit is None or self.limit <= 0 \
+                or threading.current_thread() is not threading.main_thread():
+            return
+        remaining = max(self.limit - self.clock, _ALARM_MINIMUM)
+        self._old_handler = signal.signal(signal.SIGPROF, self._alarm)
+        signal.setitimer(signal.ITIMER_PROF, remaining, _ALARM_REPEAT)
+        self._armed = True
+
+    def _disarm(self):
+        if self._armed:
+            self._armed = False
+            signal.setitimer(signal.ITIMER_PROF, 0)
+            signal.signal(signal.SIGPROF, self._old_handler)
+
+    def _alarm(self, signum, frame):
+        # (the alarm could go off just as the context is entering or exiting,
+        # when there is no need to interrupt anything---and an exception
+        # escaping __enter__ would skip __exit__, leaving the alarm set)
+        if not self._armed or frame is None or frame.f_code in _TIMER_CODE:
+            return
+        raise ResourceLimitException(f"{self.name} exceeded available time")
+
+_PREEMPT_ENABLED = hasattr(signal, "setitimer") and hasattr(signal, "SIGPROF")
+_ALARM_MINIMUM = 0.001 # (seconds; setting the alarm for 0 would cancel it)
+_ALARM_REPEAT = 0.1 # (seconds of CPU time between repeated alarms)
+_TIMER_CODE = {_CountdownTimer.__enter__.__code__,
+    _CountdownTimer._arm.__code__, _CountdownTimer.__exit__.__code__,
+    _CountdownTimer._disarm.__code__}
+
 class _MemoryWatcher:
     """
     Context manager for clearing memory before and measuring memory usage
@@ -160,6 +256,118 @@ class _MemoryWatcher:
                 raise ResourceLimitException("players exceeded shared space "
                     "limit")
 
+class _AllocationProfiler:
+    """
+    Context manager for attributing memory allocations to a player, using
+    tracemalloc.
+
+    * records the net allocation (allocated minus freed) and the peak
+      allocation of each call, by kind of call ('init', 'action', 'update')
+    * at the end of the game, can list the lines of the player's source code
+      holding the most memory allocated since its first call (lines are
+      identified by file, so if both players are loaded from the same
+      package, their lines are listed together)
+    * collects garbage before and after each call (off the clock, if used
+      outside the timer), so that garbage isn't counted as memory held
+    * only traces one frame per allocation, to keep the overhead low
+    * does nothing unless `top` (number of lines to list) is positive
+
+    Each call is measured by the change in the total traced memory, which
+    costs next to nothing (only the player runs during its calls, apart from
+    the referee's background threads). Tracemalloc can only measure a call's
+    peak from Python 3.9; before that, peaks are not reported. The source
+    lines are found by comparing just two snapshots, filtered to the
+    player's source files: one before its first call, and one at the end.
+    """
+    def __init__(self, Player, top):
+        self.top = top
+        self.enabled = top > 0
+        self.calls = {} # kind of call -> [calls, total net, max peak]
+        self.total = 0
+        self.measure_peak = hasattr(tracemalloc, "reset_peak") # (3.9+)
+        self._kind = None
+        self._before = 0
+        self._baseline = None
+        self._status = ""
+        if self.enabled:
+            self.filters = [tracemalloc.Filter(True, _source_pattern(Player))]
+    def _set_status(self, status):
+        self._status = status
+    def status(self):
+        return self._status
+
+    def __call__(self, kind):
+        self._kind = kind
+        return self
+
+    def __enter__(self):
+        if not self.enabled:
+            return self
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(1)
+        gc.collect()
+        if self._baseline is None:
+            self._baseline = tracemalloc.take_snapshot() \
+                .filter_traces(self.filters)
+        if self.measure_peak:
+            tracemalloc.reset_peak()
+        self._before, _ = tracemalloc.get_traced_memory()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if not self.enabled:
+            return
+        _, peak = tracemalloc.get_traced_memory()
+        gc.collect()
+        current, _ = tracemalloc.get_traced_memory()
+        net = current - self._before
+        self.total += net
+        calls = self.calls.setdefault(self._kind, [0, 0, 0])
+        calls[0] += 1
+        calls[1] += net
+        status = f"alloc: {net/1024:+9.1f}KB (net) "
+        if self.measure_peak:
+            peak = max(peak - self._before, net)
+            calls[2] = max(calls[2], peak)
+            status += f"{peak/1024:9.1f}KB (peak)  "
+        self._set_status(status + f"{self.total/1024:+9.1f}KB (game total)")
+
+    def report(self, name):
+        if not self.enabled or self._baseline is None:
+            return []
+        lines = [f"memory allocated by {name}: {self.total/1024:+.1f}KB net"]
+        for kind, (n, net, peak) in self.calls.items():
+            line = f"  {kind:6s}: {n:4d} calls, {net/1024:+10.1f}KB net"
+            if self.measure_peak:
+                line += f", {peak/1024:10.1f}KB largest peak"
+            lines.append(line)
+        if not self.measure_peak:
+            lines.append("  (peak allocations are only measured from "
+                "Python 3.9)")
+        snapshot = tracemalloc.take_snapshot().filter_traces(self.filters)
+        growth = snapshot.compare_to(self._baseline, "lineno")
+        growth = [stat for stat in growth if stat.size_diff > 0]
+        if growth:
+            lines.append(f"  top {min(self.top, len(growth))} source lines "
+                "by memory still held:")
+        for stat in growth[:self.top]:
+            frame = stat.traceback[0]
+            lines.append(f"    {stat.size_diff/1024:+10.1f}KB "
+                f"({stat.count_diff:+d} blocks) {frame.filename}:"
+                f"{frame.lineno}")
+        return lines
+
+def _source_pattern(Player):
+    """
+    A filename pattern matching the source files of the package (or module)
+    a Player class comes from.
+    """
+    top_name = Player.__module__.split(".")[0]
+    top = sys.modules[top_name]
+    if hasattr(top, "__path__"):
+        return os.path.join(os.path.abspath(list(top.__path__)[0]), "*")
+    return os.path.abspath(top.__file__)
+
 def _get_space_usage():
     """
     Find the current and peak Virtual Memory usage of the current process, in MB
@@ -0,0 +1,170 @@
+"""
+Provide renderers for displaying one or more live games in a terminal,
+using ANSI control sequences to redraw only those parts of each board that
+have changed since the last frame (rather than clearing the screen and
+printing the whole board after every turn).
+
+A renderer reserves a fixed area at the top of the terminal for the boards
+and confines all other output (e.g. referee commentary) to a scrolling
+region beneath them.
+
+The referee draws its own game in a grid of one board (with -r). Games
+played anywhere else, such as a batch of games (-n), a match or the
+concurrent games of a tournament, can be shown in a grid with one board per
+game by publishing their positions (-p) and following them with
+`python -m referee.snapshots --grid`.
+"""
+
+import sys
+import shutil
+
+from referee.game import _BOARD_TEMPLATE
+
+# ANSI control sequences used by the renderers
+_MOVE_TO = "\033[{row};{col}H"      # move cursor to (1-based) row, column
+_SCROLL_REGION = "\033[{top};{bottom}r" # restrict scrolling to these rows
+_RESET_SCROLL_REGION = "\033[r"
+_SAVE_CURSOR = "\0337"
+_RESTORE_CURSOR = "\0338"
+_CLEAR_SCREEN = "\033[H\033[2J"
+
+_CELL = "{:}"   # placeholder for a (3-character wide) cell in a template
+_SCORE = "{}"   # placeholder for the score line in a template
+
+
+class BoardRenderer:
+    """
+    Draw a game's board at a fixed position in the terminal. The first frame
+    is drawn in full; after that, only the cells (and score) that differ from
+    the previous frame are rewritten.
+    """
+    def __init__(self, template, file=sys.stdout, top=1, left=1):
+        """
+        Prepare to draw boards formatted with `template` (one of the game's
+        board templates) with its top-left corner at row `top` and column
+        `left` of the terminal (1-based).
+        """
+        self.template = template
+        self.file = file
+        self.top = top
+        self.left = left
+        self.lines = template.splitlines()
+        self.height = len(self.lines)
+        self.width = max(map(len, self.lines))
+        # Find where each cell will appear on screen. Cells are exactly as
+        # wide as their placeholders, so placeholder offsets within each line
+        # give screen columns directly.
+        self.cell_positions = []
+        for row, line in enumerate(self.lines):
+            col = line.find(_CELL)
+            while col >= 0:
+                self.cell_positions.append((top+row, left+col))
+                col = line.find(_CELL, col + len(_CELL))
+        for row, line in enumerate(self.lines):
+            col = line.replace(_CELL, "   ").find(_SCORE)
+            if col >= 0:
+                self.score_position = (top+row, left+col)
+                break
+        self._last_cells = None
+        self._last_score = ""
+
+    def draw(self, game):
+        """Bring the displayed board up to date with `game`."""
+        self.file.write(self.frame(game))
+        self.file.flush()
+
+    def frame(self, game):
+        """
+        Return the control sequences and text required to bring the
+        displayed board up to date with `game` (without writing them).
+        """
+        cells = game._cells()
+        score = game._score_str()
+        out = [_SAVE_CURSOR]
+        if self._last_cells is None:
+            # first frame: draw everything
+            text = self.template.format(score, *cells)
+            for row, line in enumerate(text.splitlines()):
+                out.append(_MOVE_TO.format(row=self.top+row, col=self.left))
+                out.append(line)
+        else:
+            # later frames: draw only what changed
+            for pos, cell, last in zip(self.cell_positions, cells,
+                    self._last_cells):
+                if cell != last:
+                    row, col = pos
+                    out.append(_MOVE_TO.format(row=row, col=col))
+                    out.append(cell)
+            if score != self._last_score:
+                row, col = self.score_position
+                out.append(_MOVE_TO.format(row=row, col=col))
+                # pad with spaces to overwrite any longer, previous score
+                out.append(score.ljust(len(self._last_score)))
+        out.append(_RESTORE_CURSOR)
+        self._last_cells = cells
+        self._last_score = score
+        return "".join(out)
+
+    def invalidate(self):
+        """Forget the last frame, so that the next frame is drawn in full."""
+        self._last_cells = None
+        self._last_score = ""
+
+
+class GridRenderer:
+    """
+    Arrange a board renderer for each of several concurrent games in a grid
+    at the top of the terminal. Output written to the terminal by other means
+    scrolls in the area below the grid.
+
+    Use `renderer[i].draw(game)` to update the display of the i-th game, and
+    call `close()` when finished to restore normal scrolling.
+    """
+    def __init__(self, num_games=1, columns=None, file=sys.stdout,
+            debugboard=False, unicodeboard=False, gap=2):
+        """
+        Lay out `num_games` boards (of the kind described by `debugboard`
+        and `unicodeboard`, see `Game`) in a grid with `columns` boards per
+        row (by default, as many as will fit in the terminal), separated by
+        `gap` blank columns/rows.
+        """
+        self.file = file
+        template = _BOARD_TEMPLATE(debugboard, unicodeboard)
+        lines = template.splitlines()
+        height = len(lines)
+        width = max(map(len, lines))
+        term_cols, term_rows = shutil.get_terminal_size()
+        if columns is None:
+            columns = max(1, (term_cols + gap) // (width + gap))
+        columns = max(1, min(columns, num_games))
+        self.renderers = []
+        for i in range(num_games):
+            r, c = divmod(i, columns)
+            self.renderers.append(BoardRenderer(template, file=file,
+                top=1 + r*(height+gap), left=1 + c*(width+gap)))
+        nrows = -(-num_games // columns) # (ceiling division)
+        self.bottom = nrows*(height+gap) # last row used by the grid
+        self.term_rows = term_rows
+        self._open()
+
+    def __getitem__(self, i):
+        return self.renderers[i]
+
+    def __len__(self):
+        return len(self.renderers)
+
+    def _open(self):
+        """Clear the screen and confine scrolling to below the grid."""
+        out = [_CLEAR_SCREEN]
+        if self.bottom < self.term_rows:
+            out.append(_SCROLL_REGION.format(top=self.bottom+1,
+                bottom=self.term_rows))
+        out.append(_MOVE_TO.format(row=self.bottom+1, col=1))
+        self.file.write("".join(out))
+        self.file.flush()
+
+    def close(self):
+        """Restore normal scrolling and move the cursor to the bottom."""
+        self.file.write(_RESET_SCROLL_REGION
+            + _MOVE_TO.format(row=self.term_rows, col=1) + "\n")
+        self.file.flush()
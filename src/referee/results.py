@@ -0,0 +1,134 @@
+"""
+Provide a persistent store of game results, so that tournaments only need to
+play the games whose result is not already known.
+
+Each result is stored (in an SQLite database) under a key made of:
+
+* a hash of the source code of each player (see `source_hash`), in colour
+  order, so a game is replayed if either player's code changes, but a
+  player moved or renamed without changes keeps its results;
+* the game's random seed (several games between the same players can be
+  stored under different seeds); and
+* the time and space limits the game was played under.
+"""
+
+import os
+import time
+import sqlite3
+import hashlib
+import importlib.util
+from collections import namedtuple
+
+# the key of a game result: the source hash of each player (as given by
+# `source_hash`), the random seed, and the resource limits (0 for unlimited)
+GameKey = namedtuple("GameKey",
+    ["white", "black", "seed", "time_limit", "space_limit"])
+
+def game_key(white_hash, black_hash, seed, time_limit=None, space_limit=None):
+    """Make a GameKey (treating limits of None as 0, i.e. unlimited)."""
+    return GameKey(white_hash, black_hash, seed,
+        float(time_limit or 0), float(space_limit or 0))
+
+
+def source_hash(player_loc):
+    """
+    Compute a hash of the code of the player at `player_loc` (a (package,
+    class) tuple, as produced by `options.PackageSpecAction`), without
+    running it.
+
+    Since a player may use any module in its top-level package, the hash
+    covers every file in that package's directory (including data files
+    such as weights, but not compiled bytecode), along with the path of the
+    player's module within the package and the class name (so that players
+    in different modules of one package hash differently). If the player is
+    a lone module rather than a package, only that file is hashed.
+    """
+    player_pkg, player_cls = player_loc
+    top_name, _, module_path = player_pkg.partition(".")
+    spec = importlib.util.find_spec(top_name)
+    if spec is None:
+        raise ImportError(f"cannot find the source of package '{top_name}'")
+    digest = hashlib.sha256(f"{module_path}\0{player_cls}".encode())
+    if spec.submodule_search_locations:
+        root = list(spec.submodule_search_locations)[0]
+        files = []
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = [d for d in dirnames if d != "__pycache__"]
+            files.extend(os.path.join(dirpath, f) for f in filenames
+                if not f.endswith((".pyc", ".pyo")))
+    else:
+        root = spec.origin # (so the module's own name is not hashed)
+        files = [spec.origin]
+    for path in sorted(files):
+        name = os.path.relpath(path, root) if path != root else ""
+        digest.update(name.replace(os.sep, "/").encode() + b"\0")
+        with open(path, "rb") as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
+
+
+class ResultStore:
+    """
+    A database of game results, stored in an SQLite file. Main useful
+    methods are `get`, `put` and `results`. Can be used as a context manager
+    (closing the database on exit).
+    """
+    def __init__(self, path):
+        self.db = sqlite3.connect(path)
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS games (
+                white_hash TEXT NOT NULL,
+                black_hash TEXT NOT NULL,
+                seed INTEGER NOT NULL,
+                time_limit REAL NOT NULL,
+                space_limit REAL NOT NULL,
+                winner INTEGER, -- 0 for White, 1 for Black, NULL for a draw
+                result TEXT NOT NULL,
+                white TEXT, -- (player specifications, for reference only)
+                black TEXT,
+                played TEXT,
+                PRIMARY KEY (white_hash, black_hash, seed, time_limit,
+                    space_limit))""")
+        self.db.commit()
+
+    def __enter__(self):
+        return self
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self.db.close()
+
+    def get(self, key):
+        """
+        Look up the result of the game with GameKey `key`, returning a tuple
+        (winner, result) as from `forkserver.play_quiet_game`, or None if the
+        game has not been played.
+        """
+        row = self.db.execute("SELECT winner, result FROM games WHERE "
+            "white_hash = ? AND black_hash = ? AND seed = ? AND "
+            "time_limit = ? AND space_limit = ?", key).fetchone()
+        return None if row is None else tuple(row)
+
+    def put(self, key, winner, result, white=None, black=None):
+        """
+        Store the result of the game with GameKey `key` (replacing any
+        result already stored). `white` and `black` may describe the players
+        (e.g. their package specifications), for reference.
+        """
+        self.db.execute("INSERT OR REPLACE INTO games VALUES "
+            "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", tuple(key) + (winner, result,
+            white, black, time.strftime("%Y-%m-%d %H:%M:%S")))
+        self.db.commit()
+
+    def results(self, keys):
+        """
+        Look up the results of many games, returning a dictionary from each
+        key that has a result to its (winner, result) tuple.
+        """
+        found = {}
+        for key in keys:
+            outcome = self.get(key)
+            if outcome is not None:
+                found[key] = outcome
+        return found
@@ -0,0 +1,424 @@
+"""
+Publish the position after every turn of live games into shared memory, so
+that any number of local processes (spectators, dashboards, analysis tools)
+can follow the games in real time without slowing down the referee.
+
+A snapshot buffer is a named shared memory block (see
+`multiprocessing.shared_memory`) divided into 'channels', each a ring of
+fixed-size slots that one game at a time writes positions into. (The
+referee publishes a single game, or a batch of games one after the other,
+on channel 0; a tournament gives each game running at once its own
+channel.) Layout (all fields little-endian):
+
+    header (64 bytes)
+        bytes  0-3   magic b"EXPS"
+        bytes  4-5   layout version
+        bytes  8-11  number of channels
+        bytes 12-15  number of slots in each channel
+    each channel (16 bytes, then its slots)
+        bytes  0-7   number of records written to the channel so far
+        bytes  8-11  number of games started on the channel so far
+    each slot (40 bytes)
+        bytes  0-7   sequence number (see below)
+        bytes  8-11  game number (counting from 1, within the channel)
+        byte  12     status (an index into STATUSES)
+        bytes 16-39  the position, encoded as by `codec.encode`
+
+Record r of a channel goes in slot r % slots. Writing never waits for the
+readers and takes no locks: the writer first sets the slot's sequence
+number to 2r+1 (odd, meaning 'being written'), then writes the record, then
+sets the sequence number to 2r+2 and finally bumps the channel's record
+count. A reader copies a slot and then checks that its sequence number was
+2r+2 both before and after the copy; otherwise the writer has lapped the
+reader, and that record is skipped (and counted in `SnapshotReader.missed`).
+(This relies on stores to the shared memory becoming visible in program
+order, as they do on x86 processors.)
+
+Usage (follow games in a terminal, as text or as a grid of live boards
+with one board per channel):
+    python -m referee.snapshots [options] [NAME ...]
+(run with --help for a list of options).
+"""
+
+import os
+import sys
+import time
+import struct
+import argparse
+from collections import namedtuple
+
+try:
+    from multiprocessing import shared_memory
+    AVAILABLE = True
+except ImportError: # (Python < 3.8)
+    AVAILABLE = False
+
+from referee import codec
+from referee.game import Game
+from referee.render import GridRenderer
+
+PREFIX = "expendibots-snapshots"
+VERSION = 1
+DEFAULT_SLOTS = 1024
+
+# the status of a game as at a snapshot: still going, won by a colour, drawn,
+# or stopped early by an error
+STATUSES = ("playing", "white", "black", "draw", "aborted")
+
+_HEADER = struct.Struct("<4sH2xII")
+_HEADER_SIZE = 64
+_CHANNEL = struct.Struct("<QI4x")
+_SLOT = struct.Struct("<QIB3x24s")
+_SEQUENCE = struct.Struct("<Q")
+_GAME = struct.Struct("<I")
+_NTURNS = struct.Struct("<H")
+_NTURNS_OFFSET = 16 + 20 # (bytes 20-21 of the encoded position)
+
+_created = set() # (names of the buffers created by this process)
+
+# A position read from a snapshot buffer: the channel and game it belongs
+# to, its record number in the channel, the position itself (board as a
+# tuple of 64 signed stack heights, turns taken and side to move) and the
+# game's status (see STATUSES) at that point.
+Snapshot = namedtuple("Snapshot",
+    ["channel", "game", "record", "board", "nturns", "side", "status"])
+
+def default_name():
+    """A name for this process's snapshot buffer."""
+    return f"{PREFIX}-{os.getpid()}"
+
+def list_buffers(prefix=PREFIX):
+    """
+    List the names of the snapshot buffers that currently exist (only
+    possible where shared memory blocks appear as files in /dev/shm, as on
+    Linux; elsewhere the list is empty).
+    """
+    return sorted(name for name in _shared_blocks() or ()
+        if name.startswith(prefix))
+
+def _shared_blocks():
+    """The set of names of all shared memory blocks, or None if unknown."""
+    try:
+        return set(os.listdir("/dev/shm"))
+    except OSError:
+        return None
+
+
+class SnapshotPublisher:
+    """
+    Create a snapshot buffer (removing it again on `close`). Games publish
+    positions through its channels: see `channel`.
+    """
+    def __init__(self, name=None, channels=1, slots=DEFAULT_SLOTS):
+        if not AVAILABLE:
+            raise RuntimeError("shared memory is not available "
+                "(it needs Python 3.8 or later)")
+        self.name = name or default_name()
+        self.channels = channels
+        self.slots = slots
+        size = _HEADER_SIZE + channels * (_CHANNEL.size + slots * _SLOT.size)
+        self.shm = shared_memory.SharedMemory(self.name, create=True,
+            size=size)
+        _created.add(self.name)
+        self.buf = self.shm.buf
+        self.buf[:size] = bytes(size)
+        _HEADER.pack_into(self.buf, 0, b"EXPS", VERSION, channels, slots)
+
+    def __enter__(self):
+        return self
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def channel(self, num):
+        """Get a Channel for publishing games on channel `num`."""
+        if not 0 <= num < self.channels:
+            raise IndexError(f"no channel {num} (there are {self.channels})")
+        return Channel(self, num)
+
+    def close(self):
+        """Release and remove the buffer (readers keep what they hold)."""
+        if self.buf is None:
+            return
+        self.buf.release()
+        self.buf = None
+        self.shm.close()
+        self.shm.unlink()
+        _created.discard(self.name)
+
+
+class Channel:
+    """
+    Write one game at a time into a channel of a snapshot buffer. Main
+    useful methods are `start` and `publish` (`referee.game.play` calls
+    these if given a Channel). A channel must only have one writer at a
+    time, but it can be shared with forked child processes (e.g. to play a
+    series of games in a fork server).
+    """
+    def __init__(self, publisher, num):
+        self.publisher = publisher
+        self.slots = publisher.slots
+        self.offset = _HEADER_SIZE \
+            + num * (_CHANNEL.size + publisher.slots * _SLOT.size)
+        self.game = 0
+
+    def start(self):
+        """Begin a new game (before publishing its initial position)."""
+        buf = self.publisher.buf
+        _, games = _CHANNEL.unpack_from(buf, self.offset)
+        self.game = games + 1
+        _GAME.pack_into(buf, self.offset + 8, self.game)
+
+    def publish(self, game, aborted=False):
+        """
+        Publish the current position of `game` (a `referee.game.Game`).
+        `aborted` marks the game as stopped early by an error.
+        """
+        if aborted:
+            status = 4
+        elif not game.over():
+            status = 0
+        elif game.score["white"] and not game.score["black"]:
+            status = 1
+        elif game.score["black"] and not game.score["white"]:
+            status = 2
+        else:
+            status = 3
+        buf = self.publisher.buf
+        record, _ = _CHANNEL.unpack_from(buf, self.offset)
+        slot = self.offset + _CHANNEL.size + (record % self.slots) * _SLOT.size
+        # (the game keeps the encoded position for detecting repetitions,
+        # with the turn count left out; it goes in separately)
+        _SEQUENCE.pack_into(buf, slot, 2*record + 1)
+        _SLOT.pack_into(buf, slot, 2*record + 1, self.game, status,
+            game.position)
+        _NTURNS.pack_into(buf, slot + _NTURNS_OFFSET, game.nturns)
+        _SEQUENCE.pack_into(buf, slot, 2*record + 2)
+        _SEQUENCE.pack_into(buf, self.offset, record + 1)
+
+
+class SnapshotReader:
+    """
+    Follow the games published in an existing snapshot buffer. Main useful
+    methods are `poll` and `latest`.
+    """
+    def __init__(self, name):
+        if not AVAILABLE:
+            raise RuntimeError("shared memory is not available "
+                "(it needs Python 3.8 or later)")
+        self.name = name
+        try:
+            self.shm = shared_memory.SharedMemory(name, track=False)
+        except TypeError:
+            # (before Python 3.13, attaching registers the block to be
+            # removed when this process exits, as if this process had
+            # created it, unless it is unregistered again)
+            self.shm = shared_memory.SharedMemory(name)
+            if name not in _created:
+                try:
+                    from multiprocessing import resource_tracker
+                    resource_tracker.unregister(self.shm._name,
+                        "shared_memory")
+                except Exception:
+                    pass
+        self.buf = self.shm.buf
+        magic, version, self.channels, self.slots = \
+            _HEADER.unpack_from(self.buf, 0)
+        if magic != b"EXPS" or version != VERSION:
+            self.close()
+            raise ValueError(f"'{name}' is not a snapshot buffer "
+                f"(of layout version {VERSION})")
+        self.offsets = [_HEADER_SIZE + num*(_CHANNEL.size
+            + self.slots*_SLOT.size) for num in range(self.channels)]
+        self.next = [0] * self.channels
+        self.missed = 0
+
+    def __enter__(self):
+        return self
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        if self.buf is None:
+            return
+        self.buf.release()
+        self.buf = None
+        self.shm.close()
+
+    def poll(self):
+        """
+        Return a list of the Snapshots published since the last poll (or
+        since the buffer was created, on the first poll), in order within
+        each channel, skipping any that have already been overwritten.
+        """
+        snapshots = []
+        for num in range(self.channels):
+            end, _ = _CHANNEL.unpack_from(self.buf, self.offsets[num])
+            start = max(self.next[num], end - self.slots)
+            self.missed += start - self.next[num]
+            for record in range(start, end):
+                snapshot = self._read(num, record)
+                if snapshot is None:
+                    self.missed += 1
+                else:
+                    snapshots.append(snapshot)
+            self.next[num] = end
+        return snapshots
+
+    def latest(self):
+        """
+        Return a list of the latest Snapshot on each channel that has one
+        (without affecting `poll`).
+        """
+        snapshots = []
+        for num in range(self.channels):
+            # (retry if the writer laps us, which only happens if the slot
+            # read is overwritten, so this cannot go on for long)
+            while True:
+                end, _ = _CHANNEL.unpack_from(self.buf, self.offsets[num])
+                if not end:
+                    break
+                snapshot = self._read(num, end-1)
+                if snapshot is not None:
+                    snapshots.append(snapshot)
+                    break
+        return snapshots
+
+    def _read(self, num, record):
+        """Copy a record out of its slot, or return None if overwritten."""
+        slot = self.offsets[num] + _CHANNEL.size \
+            + (record % self.slots) * _SLOT.size
+        data = bytes(self.buf[slot:slot+_SLOT.size])
+        sequence, game, status, position = _SLOT.unpack(data)
+        if sequence != 2*record + 2 \
+                or _SEQUENCE.unpack_from(self.buf, slot)[0] != sequence:
+            return None
+        board, nturns, side = codec.decode(position)
+        return Snapshot(num, game, record, board, nturns, side,
+            STATUSES[status])
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m referee.snapshots",
+        description="follow the games published by referees (see the "
+        "referee's --publish option), printing each position in text "
+        "notation.")
+    parser.add_argument("names", metavar="NAME", nargs="*",
+        help="names of snapshot buffers to follow (default: all of them, "
+        "including any created later).")
+    parser.add_argument("-l", "--latest", action="store_true",
+        help="print the latest position of each game and exit.")
+    parser.add_argument("-g", "--grid", action="store_true",
+        help="instead, keep a board for each channel of the buffers (those "
+        "existing at the start, by default) at the top of the terminal, and "
+        "redraw them as the games go on (uses ANSI control sequences).")
+    parser.add_argument("-i", "--interval", type=float, default=0.05,
+        help="how often (float, seconds) to check for new positions "
+        "(default: %(default)s).")
+    args = parser.parse_args()
+    if not AVAILABLE:
+        parser.error("shared memory is not available (it needs Python 3.8 "
+            "or later)")
+    if args.grid:
+        names = args.names or list_buffers()
+        if not names:
+            parser.error("no snapshot buffers found")
+        try:
+            readers = [SnapshotReader(name) for name in names]
+        except (OSError, ValueError) as e:
+            parser.error(f"cannot follow the buffers: {e}")
+        try:
+            _follow_grid(readers, args.interval)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for reader in readers:
+                reader.close()
+        return
+
+    readers = {}
+    try:
+        while True:
+            existing = _shared_blocks()
+            names = args.names or list_buffers()
+            for name in names:
+                if name not in readers:
+                    try:
+                        readers[name] = SnapshotReader(name)
+                    except (OSError, ValueError) as e:
+                        if args.names:
+                            parser.error(f"cannot follow '{name}': {e}")
+                        continue
+            for name, reader in list(readers.items()):
+                missed = reader.missed
+                snapshots = reader.latest() if args.latest else reader.poll()
+                for s in snapshots:
+                    print(f"{name}[{s.channel}] game {s.game}: "
+                        f"{codec.to_text(s.board, s.nturns, s.side)} "
+                        f"{s.status}")
+                if reader.missed > missed:
+                    print(f"{name}: {reader.missed - missed} positions "
+                        "overwritten before they were read", file=sys.stderr)
+                if existing is not None and name not in existing:
+                    print(f"{name}: closed", file=sys.stderr)
+                    reader.close()
+                    del readers[name]
+            sys.stdout.flush()
+            if args.latest:
+                break
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for reader in readers.values():
+            reader.close()
+
+def _follow_grid(readers, interval):
+    """
+    Draw the latest position on every channel of `readers` in a grid of
+    boards, until all of their buffers are closed.
+    """
+    boards = [(reader, num) for reader in readers
+        for num in range(reader.channels)]
+    use_unicode = sys.platform != "win32"
+    use_colour = sys.stdout.isatty() and sys.platform != "win32"
+    grid = GridRenderer(len(boards), unicodeboard=use_unicode)
+    # (each board is drawn from a Game used only for display)
+    views = [Game(unicodeboard=use_unicode, colourboard=use_colour)
+        for _ in boards]
+    shown = [None] * len(boards)
+    try:
+        for i, (reader, num) in enumerate(boards, 1):
+            print(f"board {i}: {reader.name}[{num}]")
+        while True:
+            existing = _shared_blocks()
+            latest = {}
+            for reader in readers:
+                for s in reader.latest():
+                    latest[reader.name, s.channel] = s
+            for i, (reader, num) in enumerate(boards):
+                s = latest.get((reader.name, num))
+                if s is None or s.record == shown[i]:
+                    continue
+                shown[i] = s.record
+                _show(views[i], s)
+                grid[i].draw(views[i])
+                if s.status != "playing":
+                    print(f"board {i+1}: game {s.game} over ({s.status})")
+            sys.stdout.flush()
+            if existing is not None \
+                    and not any(reader.name in existing for reader in readers):
+                print("all buffers closed")
+                break
+            time.sleep(interval)
+    finally:
+        grid.close()
+
+def _show(view, snapshot):
+    """Copy the position of a Snapshot into a display-only Game."""
+    for i, n in enumerate(snapshot.board):
+        view.board[divmod(i, 8)] = n
+    view.score = {"white": sum(n for n in snapshot.board if n > 0),
+        "black": -sum(n for n in snapshot.board if n < 0)}
+
+if __name__ == "__main__":
+    main()
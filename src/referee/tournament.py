@@ -0,0 +1,214 @@
+"""
+Play a round-robin tournament between several Player classes, keeping the
+result of every game in a database (see `referee.results`), so that running
+the tournament again only plays the games whose results are missing: those
+involving a player whose code has changed, or a newly added player, and any
+extra games or new limits asked for.
+
+Every pair of players plays the same number of games with each colour
+assignment, with seeds `seed`, `seed+1`, and so on. Games are played in
+parallel, each in a process forked from a fork server (see
+`referee.forkserver`). Their positions can be published for spectators
+(see `referee.snapshots`), each game running at once on its own channel.
+
+Usage:
+    python -m referee.tournament [options] player player [player ...]
+(run with --help for a list of options).
+"""
+
+import os
+import argparse
+from itertools import permutations
+
+from referee.log import StarLog
+from referee.options import PackageSpecAction, PKG_SPEC_HELP
+from referee.forkserver import ForkServer, play_quiet_game
+from referee.results import ResultStore, source_hash, game_key
+from referee.snapshots import SnapshotPublisher
+
+PROGRAM = "python -m referee.tournament"
+DESCRIP = "play a round-robin tournament between Player classes, only " \
+    "playing the games whose results are not already stored."
+
+def schedule(hashes, games=1, seed=0, time_limit=None, space_limit=None):
+    """
+    List the games of a tournament between players with the given source
+    hashes, as tuples (key, white, black) of a GameKey and the indices of
+    the players taking each colour.
+    """
+    return [(game_key(hashes[white], hashes[black], seed+num, time_limit,
+            space_limit), white, black)
+        for white, black in permutations(range(len(hashes)), 2)
+        for num in range(games)]
+
+def run_tournament(player_locs, store, games=1, seed=0, jobs=1,
+        time_limit=None, space_limit=None, logfn=None, server=None,
+        publisher=None):
+    """
+    Complete a tournament between the players at `player_locs` (a list of
+    (package, class) tuples), playing each missing game (up to `jobs` at
+    once) and adding its result to `store` (a ResultStore). Return a list of
+    tuples (white, black, winner, result) for every game in the tournament,
+    where `white` and `black` are player indices and `winner` is 0 (White),
+    1 (Black) or None (a draw). If `publisher` (a SnapshotPublisher with at
+    least `jobs` channels) is given, each game publishes its positions on a
+    channel no other running game is using.
+    """
+    log = logfn if logfn else (lambda *_, **__: None) # no-op
+    hashes = [source_hash(loc) for loc in player_locs]
+    games = schedule(hashes, games, seed, time_limit, space_limit)
+    known = store.results(key for key, _, _ in games)
+    # (players with the same code share their games)
+    missing = list({key: (key, white, black) for key, white, black in games
+        if key not in known}.values())
+    played = sum(key in known for key, _, _ in games)
+    log(f"{len(games)} games in the tournament: {played} already played, "
+        f"{len(missing)} to play")
+
+    if missing:
+        if server is None:
+            server = ForkServer(list(dict.fromkeys(player_locs)), logfn=log)
+        running = {}
+        channels = list(range(jobs)) if publisher is not None else []
+        try:
+            while True:
+                # keep up to `jobs` games running
+                while len(running) < jobs and missing:
+                    key, white, black = missing.pop(0)
+                    locs = [player_locs[white], player_locs[black]]
+                    channel = channels.pop(0) if channels else None
+                    job = server.submit(play_quiet_game, locs,
+                        time_limit=time_limit, space_limit=space_limit,
+                        seed=key.seed, publisher=None if channel is None
+                            else publisher.channel(channel))
+                    running[job] = (key, white, black, channel)
+                if not running:
+                    break
+                job = next(server.as_completed(list(running)))
+                key, white, black, channel = running.pop(job)
+                if channel is not None:
+                    channels.append(channel)
+                winner, result = job.result()
+                store.put(key, winner, result, _spec(player_locs[white]),
+                    _spec(player_locs[black]))
+                known[key] = (winner, result)
+                log(f"{_spec(player_locs[white])} (white) vs "
+                    f"{_spec(player_locs[black])} (black), seed {key.seed}: "
+                    f"{result}", depth=1)
+        finally:
+            for job in running:
+                job.cancel()
+
+    return [(white, black) + tuple(known[key]) for key, white, black in games]
+
+def standings(num_players, outcomes):
+    """
+    Total up the results of a tournament, returning for each player a list
+    [wins, draws, losses].
+    """
+    records = [[0, 0, 0] for _ in range(num_players)]
+    for white, black, winner, _ in outcomes:
+        if winner is None:
+            records[white][1] += 1
+            records[black][1] += 1
+        else:
+            winner, loser = (white, black) if winner == 0 else (black, white)
+            records[winner][0] += 1
+            records[loser][2] += 1
+    return records
+
+def _spec(player_loc):
+    """Write a (package, class) tuple back as a package specification."""
+    player_pkg, player_cls = player_loc
+    return player_pkg if player_cls == "Player" \
+        else f"{player_pkg}:{player_cls}"
+
+
+def get_options():
+    """Parse and return command-line arguments for a tournament."""
+    parser = argparse.ArgumentParser(prog=PROGRAM, description=DESCRIP,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    positionals = parser.add_argument_group(
+        title="player package/class specifications (positional arguments)",
+        description=PKG_SPEC_HELP)
+    positionals.add_argument('players', metavar="player", nargs="+",
+        action=_PackageSpecListAction,
+        help="location of a Player class (at least 2 are needed)")
+    parser.add_argument('-f', '--database', default="results.db",
+        help="SQLite file to keep results in (default: %(default)s).")
+    parser.add_argument('-g', '--games', type=int, default=1,
+        help="number of games for each pair of players to play with each "
+        "colour assignment (default: %(default)s).")
+    parser.add_argument('--seed', type=int, default=0,
+        help="seed for the first of each pair's games; later games use the "
+        "following seeds (default: %(default)s).")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(),
+        help="number of games to play at once (default: number of CPUs, "
+        "%(default)s).")
+    parser.add_argument('-s', '--space', metavar="space_limit", type=float,
+        default=0, help="limit on memory space (float, MB) for each player.")
+    parser.add_argument('-t', '--time', metavar="time_limit", type=float,
+        default=0, help="limit on CPU time (float, seconds) for each player.")
+    parser.add_argument('-v', '--verbosity', type=int, choices=range(0, 3),
+        default=1, help="0: only the standings; 1: (default) summary; "
+        "2: also each new game's result.")
+    parser.add_argument('-p', '--publish', metavar="NAME", nargs="?",
+        const="", default=None, help="publish the positions of the games "
+        "in a shared memory block named %(metavar)s (default: a name made "
+        "from the process id; see `python -m referee.snapshots`).")
+    options = parser.parse_args()
+    if len(options.players) < 2:
+        parser.error("at least 2 players are needed for a tournament")
+    return options
+
+class _PackageSpecListAction(PackageSpecAction):
+    """Parse each of a list of package specifications."""
+    def __call__(self, parser, namespace, values, option_string=None):
+        locs = []
+        for value in values:
+            super().__call__(parser, namespace, value)
+            locs.append(getattr(namespace, self.dest))
+        setattr(namespace, self.dest, locs)
+
+def main():
+    options = get_options()
+    out = StarLog(level=options.verbosity)
+    jobs = max(1, options.jobs)
+    publisher = None
+    if options.publish is not None:
+        try:
+            publisher = SnapshotPublisher(options.publish or None,
+                channels=jobs)
+        except (OSError, RuntimeError) as e:
+            out.print(f"error: cannot publish positions: {e}")
+            return
+        out.comment(f"publishing positions in shared memory block "
+            f"'{publisher.name}'")
+    with ResultStore(options.database) as store:
+        try:
+            outcomes = run_tournament(options.players, store,
+                games=options.games, seed=options.seed, jobs=jobs,
+                time_limit=options.time, space_limit=options.space,
+                logfn=lambda *args, depth=0: out.debug(*args, depth=depth),
+                publisher=publisher)
+        except KeyboardInterrupt:
+            print() # (end the line)
+            out.comment("bye! (results so far are kept)")
+            return
+        finally:
+            if publisher is not None:
+                publisher.close()
+    out.comment("tournament over!", depth=-1)
+    records = standings(len(options.players), outcomes)
+    order = sorted(range(len(records)),
+        key=lambda i: -(records[i][0] + records[i][1]/2))
+    width = max(len(_spec(loc)) for loc in options.players)
+    out.print(f"{'player':{width}s}  games    W    D    L  score")
+    for i in order:
+        wins, draws, losses = records[i]
+        out.print(f"{_spec(options.players[i]):{width}s}  "
+            f"{wins+draws+losses:5d} {wins:4d} {draws:4d} {losses:4d}  "
+            f"{wins + draws/2:5.1f}")
+
+if __name__ == '__main__':
+    main()
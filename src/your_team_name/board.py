@@ -0,0 +1,103 @@
+"""
+A compact board representation for use by our player (in search, playouts
+and training), along with the rules of the game needed to maintain it.
+
+A board is a tuple of 64 signed stack heights, where the square (x, y) is at
+index x*8 + y (so `np.array(boards, dtype=np.int8).reshape(-1, 8, 8)`
+gives arrays in the layout used by the `features` module). Positive numbers
+are White stacks, negative numbers are Black stacks, and zero is an empty
+square. Boards are immutable and hashable, so they can be used directly as
+dictionary keys.
+
+Actions use the same tuples as the referee: ("MOVE", n, (x, y), (x, y)) and
+("BOOM", (x, y)).
+"""
+
+COLOUR_SIGN = {"white": +1, "black": -1}
+
+def _index(square):
+    x, y = square
+    return x*8 + y
+
+SQUARES = [(i // 8, i % 8) for i in range(64)] # square at each index
+
+# For each index, the indices of the squares 1, 2, ..., 7 steps away in each
+# of the four directions (in order of distance), and the indices of the (up
+# to 8) surrounding squares.
+_RAYS = [[[_index((x+d*dx, y+d*dy)) for d in range(1, 8)
+        if 0 <= x+d*dx < 8 and 0 <= y+d*dy < 8]
+    for dx, dy in ((0, 1), (1, 0), (0, -1), (-1, 0))]
+    for x, y in SQUARES]
+NEAR = [[_index((x+dx, y+dy)) for dx in (-1, 0, 1) for dy in (-1, 0, 1)
+        if (dx or dy) and 0 <= x+dx < 8 and 0 <= y+dy < 8]
+    for x, y in SQUARES]
+
+def initial_board():
+    """The board at the start of a game."""
+    board = [0] * 64
+    for x in (0, 1, 3, 4, 6, 7):
+        board[_index((x, 0))] = board[_index((x, 1))] = +1
+        board[_index((x, 6))] = board[_index((x, 7))] = -1
+    return tuple(board)
+
+def from_squares(squares):
+    """
+    Convert a mapping from (x, y) to signed stack height (such as the
+    referee's `Game.board`) into a board.
+    """
+    board = [0] * 64
+    for square, n in squares.items():
+        board[_index(square)] = n
+    return tuple(board)
+
+def actions(board, colour):
+    """
+    List the actions available to `colour` (all BOOMs, then all MOVEs).
+    """
+    sign = COLOUR_SIGN[colour]
+    stacks = [(i, n*sign) for i, n in enumerate(board) if n*sign > 0]
+    available = [("BOOM", SQUARES[i]) for i, _ in stacks]
+    for i, n in stacks:
+        for ray in _RAYS[i]:
+            for j in ray[:n]:
+                if board[j]*sign >= 0:
+                    for m in range(1, n+1):
+                        available.append(("MOVE", m, SQUARES[i], SQUARES[j]))
+    return available
+
+def apply(board, colour, action):
+    """Return the board resulting from `colour` taking `action`."""
+    board = list(board)
+    atype, *aargs = action
+    if atype == "MOVE":
+        n, a, b = aargs
+        n *= COLOUR_SIGN[colour]
+        board[_index(a)] -= n
+        board[_index(b)] += n
+    else: # atype == "BOOM":
+        explode(board, _index(aargs[0]))
+    return tuple(board)
+
+def explode(board, i):
+    """
+    Remove the group of stacks destroyed by a BOOM at index `i` from the
+    list `board` (in place), and return their indices.
+    """
+    to_boom = [i]
+    board[i] = 0
+    for j in to_boom:
+        for k in NEAR[j]:
+            if board[k]:
+                board[k] = 0
+                to_boom.append(k)
+    return to_boom
+
+def tokens(board):
+    """Count the (White, Black) tokens remaining on the board."""
+    white = black = 0
+    for n in board:
+        if n > 0:
+            white += n
+        elif n < 0:
+            black -= n
+    return white, black
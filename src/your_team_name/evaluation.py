@@ -0,0 +1,79 @@
+"""
+Evaluate many boards at once with a small learned model over the features
+computed by the `features` module.
+
+Two kinds of model are supported: a linear model, and a multi-layer
+perceptron with one hidden layer. Either way, the value of a board is a
+number between -1 (Black is winning) and +1 (White is winning).
+
+Weights are stored in NumPy `.npz` files (as written by `Evaluator.save`,
+e.g. after training with `python -m your_team_name.train`), which are small
+and fast to load, so a Player can load them in its `__init__` method (or,
+better still, once in a `preload` hook; see `referee.forkserver`).
+"""
+
+import numpy as np
+
+from your_team_name import features
+
+# Each feature is divided by this scale before being used by a model
+# (roughly the largest value the feature takes in practice):
+FEATURE_SCALE = np.array([12, 12, 12, 12, 12, 12, 48, 48, 12, 12, 12, 12, 12],
+    dtype=np.float32)
+
+# Hand-chosen weights for a linear model, for use until trained weights are
+# available (mostly, count tokens):
+_DEFAULT_WEIGHTS = np.array(
+    [0, 0, 0.05, -0.05, 0, 0, 0.05, -0.05, 0.1, -0.1, -0.1, 0.1, 1.0],
+    dtype=np.float32)
+
+class Evaluator:
+    """
+    Evaluate boards with a linear model, tanh(w.x + b), or a multi-layer
+    perceptron, tanh(w2.relu(W1.x + b1) + b2), where x are the scaled
+    features of a board.
+    """
+    def __init__(self, params=None, scale=FEATURE_SCALE):
+        """
+        Create an evaluator from a dictionary of parameters: either 'w' and
+        'b' (linear model), or 'W1', 'b1', 'w2' and 'b2' (perceptron). By
+        default, use hand-chosen linear weights.
+        """
+        if params is None:
+            params = {"w": _DEFAULT_WEIGHTS, "b": np.float32(0)}
+        self.params = {k: np.asarray(v, dtype=np.float32)
+            for k, v in params.items()}
+        self.scale = np.asarray(scale, dtype=np.float32)
+        self.kind = "mlp" if "W1" in self.params else "linear"
+
+    @classmethod
+    def load(cls, path):
+        """Load an evaluator from a weights file."""
+        with np.load(path) as data:
+            params = {k: data[k] for k in data.files if k != "scale"}
+            return cls(params, scale=data["scale"])
+
+    def save(self, path):
+        """Save this evaluator's weights to a file."""
+        np.savez(path, scale=self.scale, **self.params)
+
+    def inputs(self, boards):
+        """Compute the (scaled) model inputs for an (N, 8, 8) int8 array."""
+        return features.extract(boards) / self.scale
+
+    def evaluate(self, boards):
+        """
+        Evaluate each of the given boards (an (N, 8, 8) int8 array, or a list
+        of tuple boards from the `board` module), from White's point of view.
+        Return an array of N values between -1 and +1.
+        """
+        boards = np.asarray(boards, dtype=np.int8).reshape(-1, 8, 8)
+        return self.forward(self.inputs(boards))
+
+    def forward(self, x):
+        """Evaluate a batch of model inputs."""
+        p = self.params
+        if self.kind == "mlp":
+            hidden = np.maximum(x @ p["W1"] + p["b1"], 0)
+            return np.tanh(hidden @ p["w2"] + p["b2"])
+        return np.tanh(x @ p["w"] + p["b"])
@@ -0,0 +1,176 @@
+"""
+Vectorised board feature extraction, for evaluating (or training on) many
+positions at once.
+
+Boards are represented as NumPy arrays of signed stack heights with shape
+(N, 8, 8) (N boards at once) and dtype int8, indexed `boards[i, x, y]` like
+the `(x, y)`-keyed board of the referee's game: positive numbers are White
+stacks, negative numbers are Black stacks, and zero is an empty square.
+
+Features are always computed from White's point of view. To get features
+from Black's point of view, negate the boards (this swaps the colours, and
+the rules of the game treat both colours alike).
+"""
+
+import numpy as np
+
+# The columns of the feature matrix returned by `extract`:
+FEATURE_NAMES = (
+    "white_tokens",     # total number of White tokens
+    "black_tokens",     # total number of Black tokens
+    "white_stacks",     # number of squares holding White tokens
+    "black_stacks",     # number of squares holding Black tokens
+    "white_tallest",    # height of White's tallest stack
+    "black_tallest",    # height of Black's tallest stack
+    "white_mobility",   # number of (stack, destination) moves for White
+    "black_mobility",   # number of (stack, destination) moves for Black
+    "white_boom_gain",  # best (Black - White) tokens destroyed by a White BOOM
+    "black_boom_gain",  # best (White - Black) tokens destroyed by a Black BOOM
+    "white_exposed",    # White tokens that some Black BOOM would destroy
+    "black_exposed",    # Black tokens that some White BOOM would destroy
+    "token_difference", # White tokens minus Black tokens
+)
+NUM_FEATURES = len(FEATURE_NAMES)
+
+_MAX_HEIGHT = 12 # (each colour starts with 12 tokens)
+
+# For each signed stack height h (offset by _MAX_HEIGHT), the number of White
+# tokens, Black tokens, White stacks and Black stacks it contributes to its
+# group, packed into 5-bit fields (no group can hold more than 24 of each):
+_PACKED_COUNTS = np.array([
+    max(h, 0) | max(-h, 0) << 5 | (h > 0) << 10 | (h < 0) << 15
+    for h in range(-_MAX_HEIGHT, _MAX_HEIGHT+1)], dtype=np.int32)
+
+def extract(boards):
+    """
+    Compute the features of each of the given boards (an (N, 8, 8) int8
+    array), returning an (N, F) float32 array with the columns described by
+    FEATURE_NAMES.
+    """
+    boards = np.asarray(boards, dtype=np.int8)
+    n = boards.shape[0]
+    white_tokens, black_tokens, white_stacks, black_stacks = \
+        _group_totals(boards, components(boards))
+    has_white = white_stacks > 0
+    has_black = black_stacks > 0
+    net = black_tokens - white_tokens
+
+    features = np.empty((n, NUM_FEATURES), dtype=np.float32)
+    features[:, 0] = white_tokens.sum(axis=1)
+    features[:, 1] = black_tokens.sum(axis=1)
+    features[:, 2] = white_stacks.sum(axis=1)
+    features[:, 3] = black_stacks.sum(axis=1)
+    features[:, 4] = np.maximum(boards.max(axis=(1, 2)), 0)
+    features[:, 5] = np.maximum(-boards.min(axis=(1, 2)), 0)
+    features[:, 6] = mobility(boards)
+    features[:, 7] = mobility(-boards)
+    features[:, 8] = np.maximum((net * has_white).max(axis=1), 0)
+    features[:, 9] = np.maximum((-net * has_black).max(axis=1), 0)
+    features[:, 10] = (white_tokens * has_black).sum(axis=1)
+    features[:, 11] = (black_tokens * has_white).sum(axis=1)
+    features[:, 12] = features[:, 0] - features[:, 1]
+    return features
+
+def mobility(boards):
+    """
+    Count, for each board, the number of distinct (stack, destination) pairs
+    of MOVE actions available to White.
+    """
+    free = ~bitboards(boards < 0)
+    count = np.zeros(boards.shape[0], dtype=np.int32)
+    tallest = int(boards.max()) if boards.size else 0
+    for d in range(1, min(tallest, 7) + 1): # (no move can go further)
+        movers = bitboards(boards >= d)
+        # Bit x*8+y is square (x, y), so moving along x shifts by 8 bits per
+        # square (squares moving off the board are simply shifted out), while
+        # moving along y shifts by one bit per square (and squares that would
+        # wrap around into the next column must be masked out first).
+        along_x = np.uint64(8*d)
+        along_y = np.uint64(d)
+        count += _popcount(movers << along_x & free)
+        count += _popcount(movers >> along_x & free)
+        count += _popcount((movers & _UP_TO_ROW[7-d]) << along_y & free)
+        count += _popcount((movers & ~_UP_TO_ROW[d-1]) >> along_y & free)
+    return count
+
+def bitboards(masks):
+    """
+    Pack an (N, 8, 8) boolean array into N 64-bit integers (with bit x*8+y
+    set if square (x, y) is marked).
+    """
+    packed = np.packbits(masks.reshape(-1, 64), axis=1, bitorder='little')
+    return packed.view('<u8').ravel()
+
+# _UP_TO_ROW[r] has bits set for all squares with y <= r
+_UP_TO_ROW = [np.uint64(sum(1 << (x*8+y) for x in range(8) for y in range(r+1)))
+    for r in range(8)]
+
+if hasattr(np, "bitwise_count"):
+    _popcount = np.bitwise_count
+else:
+    _BYTE_COUNTS = np.array([bin(b).count("1") for b in range(256)],
+        dtype=np.uint8)
+    def _popcount(bits):
+        by_byte = _BYTE_COUNTS[bits.view(np.uint8)].reshape(-1, 8)
+        return by_byte.sum(axis=1, dtype=np.int32)
+
+def components(boards):
+    """
+    Label the 8-connected groups of occupied squares of each board (the
+    squares that would explode together following a BOOM on any of them).
+
+    Return an (N, 8, 8) uint8 array where empty squares are labelled 0 and
+    squares in the same group share the same label (from 1 to 64).
+    """
+    occupied = boards != 0
+    labels = np.where(occupied,
+        np.arange(1, 65, dtype=np.uint8).reshape(1, 8, 8), np.uint8(0))
+    # Spread the largest label in each group to all of its neighbours, until
+    # every group is uniformly labelled. Most boards settle within a few
+    # rounds, so each round only works on the boards still changing.
+    active = np.arange(boards.shape[0])
+    while active.size:
+        old = labels[active]
+        # (a 3x3 maximum is a maximum over rows, then over columns)
+        spread = old.copy()
+        np.maximum(spread[:, 1:, :], old[:, :-1, :], out=spread[:, 1:, :])
+        np.maximum(spread[:, :-1, :], old[:, 1:, :], out=spread[:, :-1, :])
+        rows = spread.copy()
+        np.maximum(spread[:, :, 1:], rows[:, :, :-1], out=spread[:, :, 1:])
+        np.maximum(spread[:, :, :-1], rows[:, :, 1:], out=spread[:, :, :-1])
+        spread *= occupied[active]
+        changed = (spread != old).any(axis=(1, 2))
+        labels[active] = spread
+        active = active[changed]
+    return labels
+
+def boom_reach(boards):
+    """
+    Find the squares that some BOOM could destroy on each board.
+
+    Return a tuple (white_reach, black_reach) of (N, 8, 8) boolean arrays,
+    where `white_reach` marks the squares that would be destroyed by a BOOM
+    of some White stack (and similarly `black_reach` for Black).
+    """
+    boards = np.asarray(boards, dtype=np.int8)
+    n = boards.shape[0]
+    labels = components(boards)
+    _, _, white_stacks, black_stacks = _group_totals(boards, labels)
+    rows = np.arange(n).reshape(n, 1, 1)
+    return (white_stacks > 0)[rows, labels], (black_stacks > 0)[rows, labels]
+
+def _group_totals(boards, labels):
+    """
+    Count the White tokens, Black tokens, White stacks and Black stacks in
+    each group of squares labelled by `components`, returning four (N, 65)
+    int32 arrays indexed by label (where label 0, the empty squares, always
+    counts zero stacks).
+    """
+    n = boards.shape[0]
+    group = (np.arange(n, dtype=np.intp).reshape(n, 1, 1) * 65
+        + labels).ravel()
+    # total all four counts for each group in a single pass
+    packed = _PACKED_COUNTS[boards.ravel() + _MAX_HEIGHT]
+    totals = np.bincount(group, weights=packed, minlength=n*65)
+    totals = totals.astype(np.int32).reshape(n, 65)
+    return totals & 31, totals >> 5 & 31, totals >> 10 & 31, totals >> 15 & 31
@@ -1,5 +1,61 @@
 
+import os
+import time
+from collections import Counter
+
+from your_team_name import board
+from your_team_name.evaluation import Evaluator
+from your_team_name.search import BatchedMCTS
+from your_team_name import smp
+try:
+    from referee.budget import allocate
+except ImportError: # (a referee that gives no budgets)
+    allocate = None
+
+# Where to find trained evaluation weights (see your_team_name.train); if
+# there are none, we fall back to hand-chosen weights.
+WEIGHTS_FILE = os.path.join(os.path.dirname(__file__), "weights.npz")
+
+# How much CPU time (in seconds) to spend searching for each action when the
+# referee gives no time limit, and how many positions to evaluate together.
+SEARCH_TIME = 0.2
+BATCH_SIZE = 256
+
+# How many processes to search with: 1 for Monte Carlo tree search in this
+# process, or more for alpha-beta search on several processes sharing a
+# transposition table (see your_team_name.smp; if available). The table
+# takes this share of the referee's space limit (or TABLE_SIZE bytes, if
+# there is no limit).
+SEARCH_PROCESSES = 1
+TABLE_SHARE = 0.25
+TABLE_SIZE = 16 * 2**20
+
+# When at most SOLVE_TOKENS tokens are left on the board, first look for a
+# win within SOLVE_DEPTH turns with the solver (see your_team_name.solver),
+# spending up to SOLVE_SHARE of the time for the action on each of its two
+# searches.
+SOLVE_TOKENS = 6
+SOLVE_DEPTH = 5
+SOLVE_SHARE = 0.25
+
+# The game is a draw after this many turns per player (as in the referee).
+MAX_TURNS = 250
+
 class ExamplePlayer:
+    evaluator = None # (shared by all instances; see `preload`)
+
+    @classmethod
+    def preload(cls):
+        """
+        Load the evaluation weights, once for all instances of this class.
+        (The referee's fork server calls this once before playing a batch of
+        games; otherwise, the first instance calls it.)
+        """
+        if os.path.exists(WEIGHTS_FILE):
+            cls.evaluator = Evaluator.load(WEIGHTS_FILE)
+        else:
+            cls.evaluator = Evaluator()
+
     def __init__(self, colour):
         """
         This method is called once at the beginning of the game to initialise
@@ -11,10 +67,17 @@ class ExamplePlayer:
         program will play as (White or Black). The value will be one of the 
         strings "white" or "black" correspondingly.
         """
-        # TODO: Set up state representation.
+        self.colour = colour
+        self.board = board.initial_board()
+        if self.evaluator is None:
+            self.preload()
+        self.search = None # (see `_new_search`)
+        # (to notice when the game is over, and close the search)
+        self.nturns = 0
+        self.history = Counter({(self.board, "white"): 1})
 
 
-    def action(self):
+    def action(self, budget=None):
         """
         This method is called at the beginning of each of your turns to request 
         a choice of action from your program.
@@ -22,9 +85,42 @@ class ExamplePlayer:
         Based on the current state of the game, your player should select and 
         return an allowed action to play on this turn. The action must be
         represented based on the spec's instructions for representing actions.
+
+        The parameter budget describes how much of the time limit remains
+        (see referee.budget), if the referee provides one.
         """
-        # TODO: Decide what action to take, and return it
-        return ("BOOM", (0, 0))
+        if self.search is None:
+            self.search = self._new_search(budget)
+        if budget is None or allocate is None:
+            time_limit = SEARCH_TIME
+        else:
+            time_limit = allocate(budget, default=SEARCH_TIME)
+        if sum(board.tokens(self.board)) <= SOLVE_TOKENS:
+            # (imported here, so that importing this package doesn't import
+            # the solver, which `python -m your_team_name.solver` runs)
+            from your_team_name import solver
+            start = time.process_time()
+            result = solver.solve(self.board, self.colour, depth=SOLVE_DEPTH,
+                time_limit=time_limit*SOLVE_SHARE)
+            if result.outcome == "win":
+                return result.action
+            time_limit -= time.process_time() - start
+        return self.search.search(self.board, self.colour,
+            time_limit=max(time_limit, 0.0))
+
+    def _new_search(self, budget):
+        """
+        Set up the search, once the space limit is known (from the first
+        action's budget, if any).
+        """
+        if SEARCH_PROCESSES > 1 and smp.AVAILABLE:
+            if budget is not None and budget.space_limit is not None:
+                table_size = int(budget.space_limit * 2**20 * TABLE_SHARE)
+            else:
+                table_size = TABLE_SIZE
+            return smp.LazySMPSearch(self.evaluator,
+                processes=SEARCH_PROCESSES, table_size=table_size)
+        return BatchedMCTS(self.evaluator, batch_size=BATCH_SIZE)
 
 
     def update(self, colour, action):
@@ -45,4 +141,17 @@ class ExamplePlayer:
         for the player colour (your method does not need to validate the action
         against the game rules).
         """
-        # TODO: Update state representation in response to action.
+        self.board = board.apply(self.board, colour, action)
+        self.nturns += 1
+        position = (self.board, "black" if colour == "white" else "white")
+        self.history[position] += 1
+        if not all(board.tokens(self.board)) or self.history[position] >= 4 \
+                or self.nturns >= MAX_TURNS * 2:
+            self._close_search()
+
+    def _close_search(self):
+        """Stop the search's helper processes (if any), once the game ends."""
+        close = getattr(self.search, "close", None)
+        if close is not None:
+            close()
+        self.search = None
@@ -0,0 +1,196 @@
+"""
+Monte Carlo tree search with batched leaf evaluation.
+
+Evaluating one position at a time wastes most of the speed of a vectorised
+evaluator (see `evaluation`), since each call has a fixed overhead. Instead,
+this search descends the tree repeatedly to collect a batch of new leaves,
+evaluates all of them with a single call, and then backs up all of their
+values. While a batch is being collected, each leaf (and each node on the
+path to it) carries a 'virtual loss', which makes it look worse than it
+really is, so that later descents in the same batch spread out to different
+leaves rather than all finding the same one.
+"""
+
+import math
+import time
+
+from your_team_name import board as boardlib
+from your_team_name.evaluation import Evaluator
+
+_OTHER = {"white": "black", "black": "white"}
+
+class _Node:
+    """
+    A position in the search tree. `colour` is the player to move, and the
+    statistics (visits and total value) are from the point of view of the
+    other player (the one who chose the action leading here).
+    """
+    __slots__ = ("board", "colour", "action", "parent", "children",
+        "visits", "value", "virtual", "terminal")
+
+    def __init__(self, board, colour, action=None, parent=None):
+        self.board = board
+        self.colour = colour
+        self.action = action
+        self.parent = parent
+        self.children = None # (not yet expanded)
+        self.visits = 0
+        self.value = 0.0
+        self.virtual = 0 # (pending evaluations passing through this node)
+        self.terminal = _terminal_value(board, colour)
+
+    def expand(self):
+        self.children = [
+            _Node(boardlib.apply(self.board, self.colour, action),
+                _OTHER[self.colour], action, self)
+            for action in boardlib.actions(self.board, self.colour)]
+
+def _terminal_value(board, colour):
+    """
+    If the game is over, return its value for the player who just moved
+    (the opponent of `colour`): +1 win, -1 loss, 0 draw. Otherwise None.
+    """
+    white, black = boardlib.tokens(board)
+    if white and black:
+        return None
+    if not white and not black:
+        return 0.0
+    winner = "white" if white else "black"
+    return 1.0 if winner != colour else -1.0
+
+
+class BatchedMCTS:
+    """
+    Choose actions with Monte Carlo tree search (UCT), evaluating leaves in
+    batches. Main useful method is `search`.
+    """
+    def __init__(self, evaluator=None, batch_size=256, exploration=1.4,
+            virtual_loss=1.0):
+        """
+        Search using the given `evaluator` (by default, an `Evaluator` with
+        hand-chosen weights), collecting up to `batch_size` leaves for each
+        call to the evaluator.
+        """
+        self.evaluator = evaluator if evaluator is not None else Evaluator()
+        self.batch_size = batch_size
+        self.exploration = exploration
+        self.virtual_loss = virtual_loss
+        # (leaves evaluated, or found to be terminal, by the last search)
+        self.evaluations = 0
+
+    def search(self, board, colour, max_evaluations=None, time_limit=None):
+        """
+        Search from `board` with `colour` to move, and return the action
+        leading to the most-visited child of the root.
+
+        Stop once `max_evaluations` leaves have been evaluated (counting
+        terminal leaves, which need no evaluation) or (checked between
+        batches) `time_limit` seconds of CPU time have been used, whichever
+        comes first, or once a batch finds no leaf to back up. At least one
+        batch is always searched.
+        """
+        start = time.process_time()
+        root = _Node(board, colour)
+        root.expand()
+        if len(root.children) == 1:
+            return root.children[0].action
+        self.evaluations = 0
+        while True:
+            if not self._search_batch(root):
+                break # (nothing left to search)
+            if max_evaluations is not None \
+                    and self.evaluations >= max_evaluations:
+                break
+            if time_limit is not None \
+                    and time.process_time() - start >= time_limit:
+                break
+            if max_evaluations is None and time_limit is None:
+                break
+        best = max(root.children, key=lambda child: child.visits)
+        return best.action
+
+    def _search_batch(self, root):
+        """
+        Collect, evaluate and back up one batch of leaves. Return the number
+        of leaves backed up (terminal or evaluated).
+        """
+        pending = []
+        terminal = 0
+        for _ in range(self.batch_size):
+            leaf = self._select(root)
+            if leaf is None:
+                break # (every path ends at a leaf already in this batch)
+            if leaf.terminal is not None:
+                self._backup(leaf, leaf.terminal)
+                terminal += 1
+            else:
+                self._add_virtual_loss(leaf)
+                pending.append(leaf)
+        self.evaluations += terminal
+        if not pending:
+            return terminal
+        values = self.evaluator.evaluate([leaf.board for leaf in pending])
+        self.evaluations += len(pending)
+        for leaf, value in zip(pending, values):
+            self._remove_virtual_loss(leaf)
+            # (value is for White; convert for the player who just moved)
+            mover = _OTHER[leaf.colour]
+            self._backup(leaf, float(value) * boardlib.COLOUR_SIGN[mover])
+        return terminal + len(pending)
+
+    def _select(self, root):
+        """
+        Descend from the root, choosing children by their UCT score (with
+        virtual losses), until reaching a node not yet evaluated (or a
+        terminal node). Return that node, or None if the descent ran into a
+        node that is already waiting to be evaluated.
+        """
+        node = root
+        while True:
+            if node.terminal is not None:
+                return node
+            if node.children is None:
+                if node.visits == 0:
+                    return None if node.virtual else node
+                node.expand()
+            node = self._best_child(node)
+
+    def _best_child(self, node):
+        total = node.visits + node.virtual
+        log_total = math.log(total) if total > 1 else 0.0
+        best = None
+        best_score = -math.inf
+        for child in node.children:
+            n = child.visits + child.virtual
+            if n == 0:
+                return child # (try every child once, in order)
+            mean = (child.value - self.virtual_loss*child.virtual) / n
+            score = mean + self.exploration * math.sqrt(log_total / n)
+            if score > best_score:
+                best = child
+                best_score = score
+        return best
+
+    def _add_virtual_loss(self, leaf):
+        node = leaf
+        while node is not None:
+            node.virtual += 1
+            node = node.parent
+
+    def _remove_virtual_loss(self, leaf):
+        node = leaf
+        while node is not None:
+            node.virtual -= 1
+            node = node.parent
+
+    def _backup(self, leaf, value):
+        """
+        Add a visit with `value` (for the player who moved into `leaf`) to
+        the leaf and all its ancestors, flipping perspective at each step.
+        """
+        node = leaf
+        while node is not None:
+            node.visits += 1
+            node.value += value
+            value = -value
+            node = node.parent
@@ -0,0 +1,402 @@
+"""
+Alpha-beta search on several processes at once ('lazy SMP'), sharing one
+transposition table in shared memory.
+
+Every process searches the same root position by iterative deepening, with
+no division of work between them. They share what they learn through the
+transposition table: a position one process has searched is found in the
+table by the others, which skip it (or start with its best action). To make
+the processes' searches diverge, every other helper starts one iteration
+deeper, and helpers try actions (other than the table's best action) in a
+random order. The combined search reaches deeper, in the same time, than one
+process can alone. The deepest completed iteration of any process gives the
+action to take.
+
+The table is a fixed array of 16-byte entries in shared memory (see
+`multiprocessing.shared_memory`), written and read without any locks. Each
+entry holds two 64-bit words, `key ^ data` and `data`, where `data` packs
+the value, depth, bound type, best action and generation of a position. A reader accepts an entry only if the
+first word XORed with the second equals the key it is looking for. So an
+entry half-written by one process while another reads it (a 'torn' entry)
+just looks like an entry for some other position, and is ignored.
+
+Helper processes are forked once (at the first search) and wait between
+searches. The referee only measures the main process's CPU time and memory,
+but the helpers search for as long as the main process does, so the main
+process only searches for its share of the time given to `search` (keeping
+the CPU time of all the processes together within it). Shared memory
+requires Python 3.8+ and `os.fork`; otherwise see `AVAILABLE`.
+"""
+
+import os
+import time
+import random
+import weakref
+import multiprocessing
+
+try:
+    from multiprocessing import shared_memory
+except ImportError: # (Python < 3.8)
+    shared_memory = None
+
+from your_team_name import board as boardlib
+from your_team_name.board import SQUARES
+from your_team_name.evaluation import Evaluator
+
+AVAILABLE = shared_memory is not None and hasattr(os, "fork")
+
+ENTRY_SIZE = 16 # bytes
+_HEADER_SIZE = 64 # bytes before the entries (byte 0: the 'stop' flag)
+
+_MASK = 2**64 - 1
+_SCALE = 10000 # (values are stored as integers from -_SCALE to _SCALE)
+_EXACT, _LOWER, _UPPER = 1, 2, 3 # (kinds of value stored)
+_OTHER = {"white": "black", "black": "white"}
+
+
+class SharedTable:
+    """
+    A lock-free transposition table in shared memory (see above). Processes
+    forked after the table is created can use it too. Main useful methods
+    are `probe` and `store`.
+    """
+    def __init__(self, size):
+        """Create a table of (at most) `size` bytes."""
+        self.entries = max((size - _HEADER_SIZE) // ENTRY_SIZE, 1)
+        self.shm = shared_memory.SharedMemory(create=True,
+            size=_HEADER_SIZE + self.entries*ENTRY_SIZE)
+        self.header = self.shm.buf[:_HEADER_SIZE]
+        self.words = self.shm.buf[_HEADER_SIZE:].cast("Q")
+        self.generation = 0 # (of the current search; entries from earlier
+                            #  searches are replaced first)
+        # (if never closed, close the table at exit, before the shared
+        # memory object itself is destroyed)
+        self._finalizer = weakref.finalize(self, _close_table, self.shm,
+            [self.header, self.words], os.getpid())
+
+    @property
+    def stop(self):
+        """Whether the current search has been told to stop."""
+        return self.header[0] == 1
+    @stop.setter
+    def stop(self, value):
+        self.header[0] = 1 if value else 0
+
+    def probe(self, key):
+        """
+        Look up the position with hash `key`, returning a tuple (value,
+        depth, kind, action), or None if the position is not in the table.
+        """
+        k = 2 * (key % self.entries)
+        data = self.words[k+1]
+        if self.words[k] ^ data != key:
+            return None
+        value = (data & 0xFFFF) - 0x8000
+        depth = (data >> 16) & 0xFF
+        kind = (data >> 24) & 0x3
+        action = _decode_action((data >> 26) & 0x1FFFF)
+        return value / _SCALE, depth, kind, action
+
+    def store(self, key, value, depth, kind, action):
+        """
+        Store the result of searching the position with hash `key`, unless
+        the table holds a deeper result (for any position) from the current
+        search in its place.
+        """
+        k = 2 * (key % self.entries)
+        old = self.words[k+1]
+        if (old >> 43) & 0xFF == self.generation \
+                and (old >> 16) & 0xFF > depth:
+            return
+        data = (round(value * _SCALE) + 0x8000) | min(depth, 0xFF) << 16 \
+            | kind << 24 | _encode_action(action) << 26 \
+            | self.generation << 43
+        self.words[k] = key ^ data
+        self.words[k+1] = data
+
+    def close(self):
+        """Stop using the table (freeing it, if this process created it)."""
+        self._finalizer()
+
+def _close_table(shm, views, owner):
+    for view in views:
+        view.release()
+    shm.close()
+    if os.getpid() == owner:
+        shm.unlink()
+
+def _encode_action(action):
+    """Pack an action into 17 bits (0 for no action)."""
+    if action is None:
+        return 0
+    if action[0] == "BOOM":
+        x, y = action[1]
+        i = j = x*8 + y
+        n = 0
+    else:
+        _, n, (x, y), (u, v) = action
+        i, j = x*8 + y, u*8 + v
+    return 1 << 16 | n << 12 | i << 6 | j
+
+def _decode_action(code):
+    if not code:
+        return None
+    n, i, j = (code >> 12) & 0xF, (code >> 6) & 0x3F, code & 0x3F
+    if n == 0:
+        return ("BOOM", SQUARES[i])
+    return ("MOVE", n, SQUARES[i], SQUARES[j])
+
+
+class _Stop(Exception):
+    """For abandoning an unfinished iteration of the search."""
+
+class _AlphaBeta:
+    """
+    One process's iterative-deepening negamax search, using a shared table.
+    Values are from the point of view of the player to move: +1 for a win,
+    -1 for a loss, otherwise the evaluator's value.
+    """
+    def __init__(self, evaluator, table, rng=None):
+        self.evaluator = evaluator
+        self.table = table
+        self.rng = rng # (if given, used to shuffle the order of actions)
+        self.nodes = 0
+
+    def iterate(self, board, colour, first_depth=1, max_depth=None,
+            should_stop=None):
+        """
+        Search to depth `first_depth`, then one deeper, and so on, until
+        reaching `max_depth` (if given) or until `should_stop()` returns
+        True (checked every so often). Return (depth, action) for the
+        deepest completed iteration, or (0, None) if none was completed.
+        """
+        self.should_stop = should_stop if should_stop else (lambda: False)
+        result = (0, None)
+        depth = first_depth
+        while max_depth is None or depth <= max_depth:
+            try:
+                _, action = self._negamax(board, colour, depth, -2.0, 2.0)
+            except _Stop:
+                break
+            result = (depth, action)
+            depth += 1
+        return result
+
+    def _negamax(self, board, colour, depth, alpha, beta):
+        self.nodes += 1
+        if self.nodes % 128 == 0 and self.should_stop():
+            raise _Stop
+        terminal = _terminal_value(board, colour)
+        if terminal is not None:
+            return terminal, None
+        key = hash((board, colour)) & _MASK
+        best_action = None
+        entry = self.table.probe(key)
+        if entry is not None:
+            value, stored_depth, kind, best_action = entry
+            if stored_depth >= depth:
+                if kind == _EXACT:
+                    return value, best_action
+                if kind == _LOWER:
+                    alpha = max(alpha, value)
+                elif kind == _UPPER:
+                    beta = min(beta, value)
+                if alpha >= beta:
+                    return value, best_action
+        actions = boardlib.actions(board, colour)
+        if depth == 1:
+            # evaluate all the children together (much faster than one by
+            # one), so there is nothing to prune
+            value, action = self._evaluate_children(board, colour, actions)
+            self.table.store(key, value, 1, _EXACT, action)
+            return value, action
+
+        if self.rng is not None:
+            self.rng.shuffle(actions)
+        if best_action in actions:
+            actions.remove(best_action)
+            actions.insert(0, best_action)
+        original_alpha = alpha
+        best_value, best_action = -2.0, None
+        for action in actions:
+            child = boardlib.apply(board, colour, action)
+            value, _ = self._negamax(child, _OTHER[colour], depth-1,
+                -beta, -alpha)
+            value = -value
+            if value > best_value:
+                best_value, best_action = value, action
+                alpha = max(alpha, value)
+                if alpha >= beta:
+                    break
+        if best_value <= original_alpha:
+            kind = _UPPER
+        elif best_value >= beta:
+            kind = _LOWER
+        else:
+            kind = _EXACT
+        self.table.store(key, best_value, depth, kind, best_action)
+        return best_value, best_action
+
+    def _evaluate_children(self, board, colour, actions):
+        children = [boardlib.apply(board, colour, action)
+            for action in actions]
+        sign = boardlib.COLOUR_SIGN[colour]
+        values = self.evaluator.evaluate(children)
+        best_value, best_action = -2.0, None
+        for action, child, value in zip(actions, children, values):
+            # (a finished game is worth more than any evaluation)
+            terminal = _terminal_value(child, _OTHER[colour])
+            value = -terminal if terminal is not None else float(value)*sign
+            if value > best_value:
+                best_value, best_action = value, action
+        return best_value, best_action
+
+def _terminal_value(board, colour):
+    """
+    If the game is over, return its value for `colour` (the player to move):
+    +1 win, -1 loss, 0 draw. Otherwise None.
+    """
+    white, black = boardlib.tokens(board)
+    if white and black:
+        return None
+    if not white and not black:
+        return 0.0
+    return 1.0 if (white and colour == "white") \
+        or (black and colour == "black") else -1.0
+
+
+class LazySMPSearch:
+    """
+    Choose actions by alpha-beta search on several processes sharing a
+    transposition table (see above). Main useful methods are `search` and
+    `close`.
+    """
+    def __init__(self, evaluator=None, processes=None, table_size=16*2**20):
+        """
+        Search with `processes` processes (by default, one per CPU),
+        evaluating positions with `evaluator` (by default, an `Evaluator`
+        with hand-chosen weights), sharing a table of `table_size` bytes.
+        """
+        self.evaluator = evaluator if evaluator is not None else Evaluator()
+        self.processes = processes if processes else os.cpu_count()
+        self.table_size = table_size
+        self.table = None
+        self.helpers = []
+        self.waiting = False # (for the helpers' results of a search)
+        self.depth = 0 # (deepest iteration completed by the last search)
+
+    def _start(self):
+        """Create the table and fork the helper processes."""
+        self.table = SharedTable(self.table_size)
+        context = multiprocessing.get_context("fork")
+        pipes = [context.Pipe() for _ in range(self.processes - 1)]
+        ends = [ours for ours, _ in pipes]
+        for num, (_, theirs) in enumerate(pipes, 1):
+            helper = context.Process(target=_help, daemon=True,
+                args=(theirs, ends, self.evaluator, self.table, num))
+            helper.start()
+            theirs.close()
+            self.helpers.append((helper, ends[num-1]))
+
+    def search(self, board, colour, max_depth=None, time_limit=None):
+        """
+        Search from `board` with `colour` to move, and return the best
+        action found by the deepest iteration completed by any process.
+
+        Stop after iteration `max_depth`, or once `time_limit` seconds of
+        CPU time have been used (by all the processes together: this process
+        stops after its share, and the helpers stop with it), whichever
+        comes first. The first iteration is always completed.
+        """
+        start = time.process_time()
+        if time_limit is not None:
+            time_limit /= self.processes
+        if self.table is None:
+            self._start()
+        if self.waiting:
+            # (the last search was interrupted, e.g. by the referee's timer)
+            for _, conn in self.helpers:
+                conn.recv()
+            self.waiting = False
+        table = self.table
+        table.generation = (table.generation + 1) % 256
+        table.stop = False
+        if max_depth is None and time_limit is None:
+            max_depth = 1
+        for _, conn in self.helpers:
+            conn.send((board, colour, table.generation, max_depth))
+        self.waiting = True
+
+        main = _AlphaBeta(self.evaluator, table)
+        def out_of_time():
+            return time_limit is not None \
+                and time.process_time() - start >= time_limit
+        try:
+            # (always finish the first iteration, so there's an action to
+            # take)
+            depth, action = main.iterate(board, colour, max_depth=1)
+            if max_depth is None or max_depth > 1:
+                result = main.iterate(board, colour, first_depth=2,
+                    max_depth=max_depth, should_stop=out_of_time)
+                if result[1] is not None:
+                    depth, action = result
+        finally:
+            # (even if interrupted, so the helpers don't search on)
+            table.stop = True
+        # (check helpers' actions, just in case a table entry was mistaken
+        # for another position's, with an action not available here)
+        available = boardlib.actions(board, colour)
+        for _, conn in self.helpers:
+            helper_depth, helper_action = conn.recv()
+            if helper_depth > depth and helper_action in available:
+                depth, action = helper_depth, helper_action
+        self.waiting = False
+        self.depth = depth
+        return action
+
+    def close(self):
+        """Stop the helper processes and free the table."""
+        if self.table is not None:
+            self.table.stop = True
+        for helper, conn in self.helpers:
+            # (the helper also exits when its pipe closes, but other
+            # processes forked since, such as another search's helpers, may
+            # hold this end of it open)
+            try:
+                conn.send(None)
+            except OSError:
+                pass
+            conn.close()
+            helper.join()
+        self.helpers = []
+        self.waiting = False
+        if self.table is not None:
+            self.table.close()
+            self.table = None
+
+def _help(conn, ends, evaluator, table, num):
+    """The main loop of helper process number `num`."""
+    # (keep none of the main process's ends of the pipes open, so that this
+    # process sees its own pipe close when the main process exits)
+    for end in ends:
+        end.close()
+    parent = os.getppid()
+    rng = random.Random(num)
+    def stopped():
+        return table.stop or os.getppid() != parent
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, OSError):
+            return
+        if job is None: # (the search is being closed)
+            return
+        board, colour, generation, max_depth = job
+        table.generation = generation
+        search = _AlphaBeta(evaluator, table, rng=rng)
+        result = search.iterate(board, colour, first_depth=1 + num % 2,
+            max_depth=max_depth, should_stop=stopped)
+        try:
+            conn.send(result)
+        except OSError: # (the main process closed the search meanwhile)
+            return
@@ -0,0 +1,280 @@
+"""
+Solve positions exactly with depth-first proof-number search (df-pn), to
+find forced wins (e.g. through a chain of BOOMs) that a fixed-depth search
+can miss.
+
+Proof-number search looks for a proof that one player (the 'attacker') can
+force a win. Every position has a proof number (at least how many more
+positions must be proved won to prove it won) and a disproof number (the
+same, for proving it is not won). The search always expands the 'most-
+proving' position, reached by following, from the root, the child with the
+smallest proof number where the attacker is to move and the child with the
+smallest disproof number where the defender is to move. Depth-first
+proof-number search reaches the same positions without going back to the
+root each time, by giving each subtree thresholds for its numbers and only
+leaving it once one is reached.
+
+A position is solved within a number of turns (the 'depth'): a win proved
+is a certain win in at most that many turns (ignoring the draw rules, which
+take many more turns to apply), but a disproof only shows that there is no
+win in that many turns. So the depth is part of each position's key in the
+table of proof and disproof numbers. The table holds at most a given number
+of entries; when it is full, the half of its entries found with the least
+effort are forgotten (except those on the path being searched).
+
+Usage (command line):
+    python -m your_team_name.solver [options] POSITION
+where POSITION is a position in text notation (see `referee.codec`; only
+if the referee package is available), or a JSON object (or the name of a file holding one) listing the stacks of each
+colour as [n, x, y] triples, e.g. '{"white": [[1, 0, 0]], "black": [[1, 1,
+1]]}' (run with --help for a list of options).
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from collections import namedtuple
+
+from your_team_name import board as boardlib
+try:
+    from referee import codec
+except ImportError: # (text notation is then not available)
+    codec = None
+
+INFINITY = 10**9
+
+_OTHER = {"white": "black", "black": "white"}
+
+# The outcome of solving a position: 'win' (the player to move can force a
+# win; `action` is a winning action), 'loss' (the other player can force a
+# win) or None (neither within `depth` turns, or out of nodes or time), and
+# the number of positions expanded.
+Result = namedtuple("Result", ["outcome", "action", "depth", "nodes"])
+
+class _OutOfBudget(Exception):
+    """For stopping a search that has run out of nodes or time."""
+
+
+class ProofNumberSearch:
+    """
+    Prove or disprove that a player can force a win within some number of
+    turns. Main useful method is `prove`.
+    """
+    def __init__(self, max_entries=200000, max_nodes=None, time_limit=None):
+        """
+        Keep at most `max_entries` positions in the table, and stop (without
+        an answer) after expanding `max_nodes` positions or using
+        `time_limit` seconds of CPU time (if given).
+        """
+        self.max_entries = max_entries
+        self.max_nodes = max_nodes
+        self.time_limit = time_limit
+        self.table = {} # (board, colour to move, depth) -> [pn, dn, work,
+                        #                                   proving action]
+        self.path = set() # (positions being searched, from the root down)
+        self.nodes = 0
+
+    def prove(self, board, colour, attacker, depth):
+        """
+        Try to prove that `attacker` can force a win within `depth` turns,
+        from `board` with `colour` to move. Return (True, action) if so
+        (where action is a winning action, if `attacker` is to move), (False,
+        None) if not, or (None, None) if the search ran out of nodes or time.
+        """
+        self.attacker = attacker
+        self.start = time.process_time()
+        self.nodes = 0
+        self.path = set()
+        root = (board, colour, depth)
+        try:
+            self._mid(root, INFINITY, INFINITY)
+        except _OutOfBudget:
+            return None, None
+        pn, dn, _, action = self._lookup(root)
+        if pn == 0:
+            return True, action
+        if dn == 0:
+            return False, None
+        return None, None
+
+    def _lookup(self, node):
+        """Get a position's entry (working out one for a new position)."""
+        entry = self.table.get(node)
+        if entry is not None:
+            return entry
+        board, colour, depth = node
+        white, black = boardlib.tokens(board)
+        if not white or not black:
+            winner = "white" if white else "black" if black else None
+            if winner == self.attacker:
+                return [0, INFINITY, 0, None]
+            return [INFINITY, 0, 0, None]
+        if depth == 0:
+            return [INFINITY, 0, 0, None] # (no win in time)
+        return [1, 1, 0, None]
+
+    def _store(self, node, entry):
+        self.table[node] = entry
+        if len(self.table) > self.max_entries:
+            # forget the half of the entries that took the least work (by
+            # rank, since many entries tie), keeping the path being searched
+            ranked = sorted(self.table, key=lambda old: self.table[old][2])
+            for old in ranked[:len(ranked) // 2]:
+                if old not in self.path:
+                    del self.table[old]
+
+    def _mid(self, node, proof_threshold, disproof_threshold):
+        """
+        Search below `node` until its proof number reaches
+        `proof_threshold` or its disproof number reaches
+        `disproof_threshold`.
+        """
+        entry = self._lookup(node)
+        if entry[0] >= proof_threshold or entry[1] >= disproof_threshold:
+            return
+        self.nodes += 1
+        if self.max_nodes is not None and self.nodes > self.max_nodes:
+            raise _OutOfBudget
+        if self.time_limit is not None and self.nodes % 64 == 0 \
+                and time.process_time() - self.start > self.time_limit:
+            raise _OutOfBudget
+        start_nodes = self.nodes
+        board, colour, depth = node
+        children = [(action, (boardlib.apply(board, colour, action),
+                _OTHER[colour], depth-1))
+            for action in boardlib.actions(board, colour)]
+        attacking = colour == self.attacker
+        self.path.add(node)
+        try:
+            self._search_children(node, children, attacking,
+                proof_threshold, disproof_threshold, start_nodes)
+        finally:
+            self.path.discard(node)
+
+    def _search_children(self, node, children, attacking, proof_threshold,
+            disproof_threshold, start_nodes):
+        """The main loop of `_mid`, once `node` has been expanded."""
+        while True:
+            # (from the attacker's point of view, 'pn' is the number to
+            # minimise and 'dn' is the number to sum; for the defender, the
+            # other way around)
+            best = best_n = second_n = None
+            total = 0
+            for action, child in children:
+                pn, dn, _, _ = self._lookup(child)
+                n, m = (pn, dn) if attacking else (dn, pn)
+                total = min(total + m, INFINITY)
+                if best_n is None or n < best_n:
+                    best, second_n, best_n = (action, child, m), best_n, n
+                elif second_n is None or n < second_n:
+                    second_n = n
+            if second_n is None:
+                second_n = INFINITY
+            if attacking:
+                entry = [best_n, total, 0, best[0] if best_n == 0 else None]
+                thresholds = (proof_threshold, disproof_threshold)
+            else:
+                entry = [total, best_n, 0, None]
+                thresholds = (disproof_threshold, proof_threshold)
+            entry[2] = self.nodes - start_nodes + 1
+            self._store(node, entry)
+            if entry[0] >= proof_threshold or entry[1] >= disproof_threshold:
+                return
+            # search the most-proving child, until it is no longer the best
+            # or its parent reaches a threshold
+            action, child, m = best
+            minimised_threshold = min(thresholds[0], second_n + 1)
+            summed_threshold = thresholds[1] - total + m
+            if attacking:
+                self._mid(child, minimised_threshold, summed_threshold)
+            else:
+                self._mid(child, summed_threshold, minimised_threshold)
+
+
+def solve(board, colour, depth=9, max_entries=200000, max_nodes=None,
+        time_limit=None):
+    """
+    Find out whether `colour` (to move on `board`, a tuple of 64 signed
+    stack heights; see `board`) can force a win within `depth` turns, or
+    its opponent can. Return a Result. (The limits on nodes and time apply
+    to each of the two searches.)
+    """
+    search = ProofNumberSearch(max_entries, max_nodes, time_limit)
+    won, action = search.prove(board, colour, colour, depth)
+    nodes = search.nodes
+    if won:
+        return Result("win", action, depth, nodes)
+    if won is False:
+        search.table = {}
+        lost, _ = search.prove(board, colour, _OTHER[colour], depth)
+        nodes += search.nodes
+        if lost:
+            return Result("loss", None, depth, nodes)
+    return Result(None, None, depth, nodes)
+
+
+def read_position(text):
+    """
+    Read a position given in text notation, as JSON, or as the name of a
+    JSON file (see above), returning a tuple (board, colour to move or
+    None).
+    """
+    if os.path.exists(text):
+        with open(text) as f:
+            text = f.read()
+    try:
+        stacks = json.loads(text)
+    except ValueError:
+        if codec is None:
+            raise ValueError("text notation needs the referee package")
+        position = codec.from_text(text)
+        return position.board, position.side
+    board = [0] * 64
+    for colour, sign in boardlib.COLOUR_SIGN.items():
+        for n, x, y in stacks.get(colour, []):
+            board[x*8 + y] = sign * n
+    return tuple(board), None
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m your_team_name.solver",
+        description="find out whether either player can force a win from a "
+        "position.")
+    parser.add_argument("position", metavar="POSITION",
+        help="the position, in text notation or as JSON (or a JSON file).")
+    parser.add_argument("-c", "--colour", choices=("white", "black"),
+        help="the player to move (default: as given in text notation, or "
+        "white).")
+    parser.add_argument("-d", "--depth", type=int, default=9,
+        help="look for wins within this many turns (default: "
+        "%(default)s).")
+    parser.add_argument("-n", "--nodes", type=int, default=None,
+        help="give up after expanding this many positions.")
+    parser.add_argument("-m", "--max-entries", type=int, default=200000,
+        help="most positions to keep in the table (default: %(default)s).")
+    args = parser.parse_args()
+
+    try:
+        board, colour = read_position(args.position)
+    except (ValueError, TypeError, KeyError) as e:
+        parser.error(f"cannot read position: {e}")
+    colour = args.colour or colour or "white"
+    start = time.process_time()
+    result = solve(board, colour, depth=args.depth,
+        max_entries=args.max_entries, max_nodes=args.nodes)
+    elapsed = time.process_time() - start
+    if codec is not None:
+        print(codec.to_text(board, side=colour))
+    if result.outcome == "win":
+        print(f"{colour} (to move) can force a win within {args.depth} "
+            f"turns, starting with {result.action}")
+    elif result.outcome == "loss":
+        print(f"{_OTHER[colour]} can force a win within {args.depth} turns")
+    else:
+        print(f"no forced win found within {args.depth} turns")
+    print(f"({result.nodes} positions expanded in {elapsed:.2f}s)",
+        file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
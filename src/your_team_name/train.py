@@ -0,0 +1,271 @@
+"""
+Learn evaluation weights from recorded games.
+
+Games are read from referee log files (as written with `python -m referee
+-l LOGFILE`; several logs may be concatenated into one file). Each game is
+replayed, and every position in it is paired with a target value: either
+the final outcome of the game (+1 White won, -1 Black won, 0 draw), or more
+generally its TD(lambda) return, which mixes the outcome with the current
+model's own evaluations of the positions that followed.
+
+Training streams through the logs with a bounded buffer of positions, so
+memory use stays flat no matter how many games there are. Every position is
+also used with its colours swapped (and its target negated), since the rules
+treat both colours alike.
+
+Usage:
+    python -m your_team_name.train [options] LOGFILE [LOGFILE ...]
+(run with --help for a list of options).
+"""
+
+import re
+import sys
+import time
+import argparse
+
+import numpy as np
+
+from your_team_name import board as boardlib
+from your_team_name.features import NUM_FEATURES
+from your_team_name.evaluation import Evaluator
+
+# Patterns for the lines of a referee log file:
+_START_RE = re.compile(r"\[game \] - ")
+_MOVE_RE = re.compile(
+    r"\[(white|black)\] - MOVE (\d+) from \((\d), (\d)\) to \((\d), (\d)\)\.")
+_BOOM_RE = re.compile(r"\[(white|black)\] - BOOM at \((\d), (\d)\)\.")
+_OVER_RE = re.compile(r"\[over \] - (.*)")
+_ERROR_RE = re.compile(r"\[error\] - ")
+
+def read_games(paths):
+    """
+    Generate the games recorded in the given log files, each as a pair
+    (actions, outcome) where `actions` is a list of (colour, action) pairs
+    and `outcome` is +1 (White won), -1 (Black won) or 0 (draw). Games that
+    did not finish normally (e.g. due to an illegal action) are skipped.
+    """
+    for path in paths:
+        with open(path) as logfile:
+            actions = None
+            for line in logfile:
+                if _START_RE.match(line):
+                    actions = []
+                    continue
+                if actions is None:
+                    continue
+                move = _MOVE_RE.match(line)
+                boom = _BOOM_RE.match(line)
+                over = _OVER_RE.match(line)
+                if move:
+                    colour, n, ax, ay, bx, by = move.groups()
+                    actions.append((colour, ("MOVE", int(n),
+                        (int(ax), int(ay)), (int(bx), int(by)))))
+                elif boom:
+                    colour, x, y = boom.groups()
+                    actions.append((colour, ("BOOM", (int(x), int(y)))))
+                elif over:
+                    result = over.group(1)
+                    if result == "winner: white":
+                        yield actions, +1
+                    elif result == "winner: black":
+                        yield actions, -1
+                    else:
+                        yield actions, 0
+                    actions = None
+                elif _ERROR_RE.match(line):
+                    actions = None
+
+def replay(actions):
+    """
+    Return an (T+1, 8, 8) int8 array of the boards in a game with T actions
+    (starting with the initial board).
+    """
+    board = boardlib.initial_board()
+    boards = [board]
+    for colour, action in actions:
+        board = boardlib.apply(board, colour, action)
+        boards.append(board)
+    return np.array(boards, dtype=np.int8).reshape(-1, 8, 8)
+
+def lambda_returns(values, outcome, lam):
+    """
+    Compute the TD(lambda) return for each position of a game, given the
+    current model's values of the positions and the game's outcome (which
+    replaces the value of the final position). With lam=1 the return is the
+    outcome itself; with lam=0 it is the value of the following position.
+    """
+    returns = np.empty(len(values), dtype=np.float32)
+    returns[-1] = outcome
+    for t in range(len(values)-2, -1, -1):
+        next_value = outcome if t+1 == len(values)-1 else values[t+1]
+        returns[t] = (1-lam)*next_value + lam*returns[t+1]
+    return returns
+
+
+class _Adam:
+    """The Adam optimiser, for a dictionary of NumPy parameter arrays."""
+    def __init__(self, params, learning_rate, beta1=0.9, beta2=0.999,
+            epsilon=1e-8):
+        self.params = params
+        self.learning_rate = learning_rate
+        self.beta1 = beta1
+        self.beta2 = beta2
+        self.epsilon = epsilon
+        self.m = {k: np.zeros_like(v) for k, v in params.items()}
+        self.v = {k: np.zeros_like(v) for k, v in params.items()}
+        self.t = 0
+
+    def step(self, grads):
+        self.t += 1
+        correction1 = 1 - self.beta1**self.t
+        correction2 = 1 - self.beta2**self.t
+        for k, g in grads.items():
+            self.m[k] = self.beta1*self.m[k] + (1-self.beta1)*g
+            self.v[k] = self.beta2*self.v[k] + (1-self.beta2)*g*g
+            step = self.learning_rate * (self.m[k]/correction1) \
+                / (np.sqrt(self.v[k]/correction2) + self.epsilon)
+            self.params[k] -= step.astype(np.float32)
+
+
+def gradients(evaluator, x, targets):
+    """
+    Compute the mean squared error of the evaluator on inputs `x` against
+    `targets`, and its gradient with respect to each parameter. Return a
+    pair (loss, grads).
+    """
+    p = evaluator.params
+    n = len(x)
+    if evaluator.kind == "mlp":
+        pre = x @ p["W1"] + p["b1"]
+        hidden = np.maximum(pre, 0)
+        y = np.tanh(hidden @ p["w2"] + p["b2"])
+    else:
+        y = np.tanh(x @ p["w"] + p["b"])
+    error = y - targets
+    loss = float(np.mean(error*error))
+    # back-propagate (through tanh) the gradient of half the squared error
+    delta = error * (1 - y*y) / n
+    if evaluator.kind == "mlp":
+        delta_hidden = np.outer(delta, p["w2"]) * (pre > 0)
+        grads = {"W1": x.T @ delta_hidden, "b1": delta_hidden.sum(axis=0),
+            "w2": hidden.T @ delta, "b2": delta.sum()}
+    else:
+        grads = {"w": x.T @ delta, "b": delta.sum()}
+    return loss, grads
+
+def new_evaluator(model="linear", hidden=16, rng=None):
+    """Create an evaluator with freshly initialised weights."""
+    if model == "linear":
+        return Evaluator()
+    rng = rng if rng is not None else np.random.default_rng()
+    return Evaluator({
+        "W1": rng.normal(0, np.sqrt(2/NUM_FEATURES), (NUM_FEATURES, hidden)),
+        "b1": np.zeros(hidden),
+        "w2": rng.normal(0, np.sqrt(1/hidden), hidden),
+        "b2": 0})
+
+def train(paths, evaluator, lam=1.0, epochs=1, learning_rate=0.01,
+        batch_size=256, buffer_size=8192, rng=None, logfn=None):
+    """
+    Train `evaluator` (in place) on the games in the log files at `paths`.
+
+    Positions are collected into a buffer of up to `buffer_size` positions,
+    which is shuffled and used in minibatches of `batch_size` positions.
+    """
+    log = logfn if logfn else (lambda *_, **__: None) # no-op
+    rng = rng if rng is not None else np.random.default_rng()
+    optimiser = _Adam(evaluator.params, learning_rate)
+
+    def learn_from(xs, ys):
+        x = np.concatenate(xs)
+        y = np.concatenate(ys)
+        order = rng.permutation(len(x))
+        total = 0.0
+        for start in range(0, len(x), batch_size):
+            batch = order[start:start+batch_size]
+            loss, grads = gradients(evaluator, x[batch], y[batch])
+            optimiser.step(grads)
+            total += loss * len(batch)
+        return total
+
+    for epoch in range(1, epochs+1):
+        start_time = time.time()
+        xs, ys = [], []
+        buffered = 0
+        total_loss = 0.0
+        positions = games = 0
+        for actions, outcome in read_games(paths):
+            boards = replay(actions)
+            for sign in (+1, -1): # (and with colours swapped)
+                x = evaluator.inputs(sign * boards)
+                if lam < 1:
+                    targets = lambda_returns(evaluator.forward(x),
+                        sign*outcome, lam)
+                else:
+                    targets = np.full(len(x), sign*outcome, dtype=np.float32)
+                xs.append(x)
+                ys.append(targets)
+                buffered += len(x)
+            games += 1
+            if buffered >= buffer_size:
+                total_loss += learn_from(xs, ys)
+                positions += buffered
+                xs, ys = [], []
+                buffered = 0
+        if buffered:
+            total_loss += learn_from(xs, ys)
+            positions += buffered
+        if not positions:
+            log("no finished games found!")
+            return evaluator
+        log(f"epoch {epoch}: {games} games, {positions} positions, "
+            f"mean squared error {total_loss/positions:.4f} "
+            f"({time.time()-start_time:.1f}s)")
+    return evaluator
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m your_team_name.train",
+        description="learn evaluation weights from referee log files.")
+    parser.add_argument("logfiles", nargs="+", metavar="LOGFILE",
+        help="referee log files containing the games to learn from.")
+    parser.add_argument("-o", "--output", default="weights.npz",
+        help="where to save the learned weights (default: %(default)s).")
+    parser.add_argument("-i", "--init", metavar="WEIGHTS",
+        help="start from these weights, rather than new weights.")
+    parser.add_argument("-m", "--model", choices=("linear", "mlp"),
+        default="linear", help="kind of model to learn "
+        "(default: %(default)s).")
+    parser.add_argument("--hidden", type=int, default=16,
+        help="number of hidden units for an mlp model "
+        "(default: %(default)s).")
+    parser.add_argument("-l", "--lambda", dest="lam", type=float, default=1.0,
+        help="TD(lambda) parameter; 1 means regression on game outcomes "
+        "(default: %(default)s).")
+    parser.add_argument("-e", "--epochs", type=int, default=1,
+        help="number of passes over the games (default: %(default)s).")
+    parser.add_argument("-r", "--learning-rate", type=float, default=0.01,
+        help="Adam learning rate (default: %(default)s).")
+    parser.add_argument("-b", "--batch-size", type=int, default=256,
+        help="positions per minibatch (default: %(default)s).")
+    parser.add_argument("--buffer-size", type=int, default=8192,
+        help="positions to collect and shuffle between updates "
+        "(default: %(default)s).")
+    parser.add_argument("--seed", type=int, default=None,
+        help="random seed (for initial weights and shuffling).")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    if args.init is not None:
+        evaluator = Evaluator.load(args.init)
+    else:
+        evaluator = new_evaluator(args.model, args.hidden, rng)
+    train(args.logfiles, evaluator, lam=args.lam, epochs=args.epochs,
+        learning_rate=args.learning_rate, batch_size=args.batch_size,
+        buffer_size=args.buffer_size, rng=rng,
+        logfn=lambda msg: print(msg, file=sys.stderr))
+    evaluator.save(args.output)
+    print(f"saved {evaluator.kind} weights to {args.output}", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
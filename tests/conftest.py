@@ -0,0 +1,5 @@
+import os
+import sys
+
+# (the packages live in src/, which has no installable packaging)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
@@ -0,0 +1,69 @@
+"""
+Check that positions survive a round trip through `referee.codec`, and
+that the codec rejects boards which no game could reach.
+"""
+
+import pytest
+
+from referee import codec
+from test_rules import _random_turns
+
+
+def _random_positions(seed=2):
+    positions = []
+    for game, colour, action in _random_turns(num_games=20, seed=seed):
+        game.update(colour, action)
+        positions.append((dict(game.board), game.nturns))
+    return positions
+
+def test_codec_round_trip():
+    encodings = {}
+    for board, nturns in _random_positions():
+        data = codec.encode(board, nturns)
+        assert len(data) == codec.SIZE
+        position = codec.decode(data)
+        assert position.nturns == nturns
+        assert position.side == codec.SIDES[nturns % 2]
+        assert position.board == tuple(board[divmod(i, 8)]
+            for i in range(64))
+        assert codec.from_text(codec.to_text(board, nturns)) == position
+        # (different positions must never share an encoding)
+        key = frozenset((sq, n) for sq, n in board.items() if n)
+        assert encodings.setdefault(data, key) == key
+
+@pytest.mark.skipif(codec.np is None, reason="NumPy is not installed")
+def test_bulk_codec_matches_codec():
+    positions = _random_positions(seed=3)
+    boards = codec.np.array([[[board[x, y] for y in range(8)]
+        for x in range(8)] for board, _ in positions])
+    nturns = codec.np.array([n for _, n in positions])
+    records = codec.encode_array(boards, nturns)
+    assert records.tobytes() == b"".join(codec.encode(board, n)
+        for board, n in positions)
+    decoded, decoded_nturns, sides = codec.decode_array(records)
+    assert (decoded == boards).all()
+    assert (decoded_nturns == nturns).all()
+    assert (sides == nturns % 2).all()
+
+@pytest.mark.parametrize("board, nturns", [
+    ({(0, 0): 13}, 0),
+    ({(0, 0): -13}, 0),
+    ({(x, 0): 5 for x in range(5)}, 0),
+    ({(0, 0): 1}, 2**16),
+    ({(0, 0): 1}, -1),
+])
+def test_codec_rejects_impossible_boards(board, nturns):
+    with pytest.raises(ValueError, match="invalid position"):
+        codec.encode(board, nturns)
+    with pytest.raises(ValueError, match="invalid position"):
+        codec.to_text(board, nturns)
+
+@pytest.mark.parametrize("text", [
+    "LLA5/8/8/8/8/8/8/8 w 0",
+    "9/8/8/8/8/8/8/8 w 0",
+    "8A/8/8/8/8/8/8/8 w 0",
+    "A7/8/8/8/8/8/8/8 w -1",
+])
+def test_from_text_rejects_impossible_boards(text):
+    with pytest.raises(ValueError, match="invalid position"):
+        codec.from_text(text)
@@ -0,0 +1,14 @@
+"""
+Check that a match scores games in which a player crashes, rather than
+stopping.
+"""
+
+from referee.match import SPRT, run_match
+
+from test_tournament import RANDOM, CRASHING
+
+def test_match_scores_crashes_as_losses():
+    sprt = SPRT()
+    status = run_match(RANDOM, CRASHING, sprt, max_games=6, jobs=2)
+    assert (sprt.wins, sprt.draws, sprt.losses) == (6, 0, 0)
+    assert status in ("H1", None)
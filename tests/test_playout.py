@@ -0,0 +1,20 @@
+"""
+Check that the playout engine's guided playouts come out the same whether
+BOOMs are looked up in a `referee.clusters.ClusterIndex` or searched for.
+"""
+
+import random
+
+from your_team_name import board as boardlib
+from your_team_name import playout
+
+def _playouts(seed):
+    rng = random.Random(seed)
+    start = boardlib.initial_board()
+    return [playout.playout(start, "white", playout.HEURISTICS["boom"],
+        rng=rng) for _ in range(200)]
+
+def test_cluster_index_matches_search(monkeypatch):
+    indexed = _playouts(seed=4)
+    monkeypatch.setattr(playout, "ClusterIndex", None)
+    assert _playouts(seed=4) == indexed
@@ -0,0 +1,117 @@
+"""
+Check the referee's rule enforcement against the original, direct
+implementations: BOOMs resolved by searching outwards from the square (in
+place of `referee.clusters.ClusterIndex`), and repeated positions detected
+with tuples of occupied squares (in place of `referee.codec` encodings).
+"""
+
+import random
+from collections import Counter
+
+from referee.game import Game, _NEAR_SQUARES
+
+NUM_GAMES = 60
+
+def _boom_squares(board, square):
+    """The squares a BOOM at `square` destroys, by breadth-first search."""
+    to_boom = [square]
+    for boom_square in to_boom:
+        for near_square in _NEAR_SQUARES(boom_square):
+            if board[near_square] != 0 and near_square not in to_boom:
+                to_boom.append(near_square)
+    return set(to_boom)
+
+def _tuple_snap(game):
+    return (tuple(sorted((sq, n) for sq, n in game.board.items() if n)),
+        game.nturns % 2)
+
+def _random_turns(num_games=NUM_GAMES, seed=0):
+    """
+    Generate (game, colour, action) for each turn of some random games. The
+    caller must apply each action (with `game.update`) before continuing.
+    """
+    rng = random.Random(seed)
+    for _ in range(num_games):
+        game = Game()
+        colour, other = "white", "black"
+        last = {"white": None, "black": None}
+        while not game.over():
+            actions = game._available_actions(colour)
+            booms = [a for a in actions if a[0] == "BOOM"]
+            undo = last[colour] and ("MOVE", last[colour][1],
+                last[colour][3], last[colour][2])
+            # (BOOM more often than at random, to reach positions with few
+            # stacks left, and often move straight back, to reach repeated
+            # positions)
+            if rng.random() < 0.05:
+                action = rng.choice(booms)
+            elif undo in actions and rng.random() < 0.7:
+                action = undo
+            else:
+                action = rng.choice(actions)
+            last[colour] = action if action[0] == "MOVE" else None
+            yield game, colour, action
+            colour, other = other, colour
+
+
+def test_clusters_match_search():
+    for game, colour, action in _random_turns():
+        for square, n in game.board.items():
+            if not n:
+                continue
+            expected = _boom_squares(game.board, square)
+            cluster = game.clusters.cluster(square)
+            assert cluster.squares == expected
+            assert cluster.white == sum(max(game.board[sq], 0)
+                for sq in expected)
+            assert cluster.black == sum(max(-game.board[sq], 0)
+                for sq in expected)
+        before = dict(game.board)
+        score = dict(game.score)
+        game.update(colour, action)
+        if action[0] == "BOOM":
+            destroyed = {sq for sq, n in before.items()
+                if n and not game.board[sq]}
+            assert destroyed == _boom_squares(before, action[1])
+            assert score["white"] - game.score["white"] \
+                == sum(before[sq] for sq in destroyed if before[sq] > 0)
+            assert score["black"] - game.score["black"] \
+                == -sum(before[sq] for sq in destroyed if before[sq] < 0)
+
+def _shuffle_turns():
+    """
+    Generate (game, colour, action) for the turns of a game in which white
+    takes a 2-stack round a three-move cycle while black steps back and
+    forth, so that boards repeat with either player to move.
+    """
+    game = Game()
+    yield game, "white", ("MOVE", 1, (0, 1), (1, 1))
+    cycle = [(1, 1), (1, 2), (1, 3)]
+    shuffle = [(0, 6), (0, 5)]
+    while not game.over():
+        turn = (game.nturns - 1) // 2
+        if game.nturns % 2:
+            a, b = shuffle[turn % 2], shuffle[(turn+1) % 2]
+            yield game, "black", ("MOVE", 1, a, b)
+        else:
+            a, b = cycle[turn % 3], cycle[(turn+1) % 3]
+            yield game, "white", ("MOVE", 2, a, b)
+
+def _check_repetitions(turns):
+    history = Counter()
+    for game, colour, action in turns:
+        if game.nturns == 0:
+            history = Counter({_tuple_snap(game): 1})
+        game.update(colour, action)
+        history[_tuple_snap(game)] += 1
+        assert game.position == game._snap()
+        assert game.history[game.position] == history[_tuple_snap(game)]
+        assert (history[_tuple_snap(game)] >= 4) \
+            == (game.drawmsg == "game state occurred 4 times.")
+
+def test_repetitions_match_tuple_snapshots():
+    _check_repetitions(_random_turns(seed=1))
+
+def test_repetitions_count_side_to_move():
+    _check_repetitions(_shuffle_turns())
+
@@ -0,0 +1,46 @@
+"""
+Check that games in which a player crashes are scored rather than stopping
+a whole tournament.
+"""
+
+import random
+
+from referee.game import Game
+from referee.forkserver import play_quiet_game
+from referee.results import ResultStore
+from referee.tournament import run_tournament, standings
+
+class RandomPlayer:
+    def __init__(self, colour):
+        self.colour = colour
+        self.game = Game()
+    def action(self):
+        return random.choice(self.game._available_actions(self.colour))
+    def update(self, colour, action):
+        self.game.update(colour, action)
+
+class CrashingPlayer(RandomPlayer):
+    def action(self):
+        return 1 / 0
+
+class CrashingInitPlayer:
+    def __init__(self, colour):
+        raise ZeroDivisionError("no player today")
+
+RANDOM = (__name__, "RandomPlayer")
+CRASHING = (__name__, "CrashingPlayer")
+
+def test_crash_loses_the_game():
+    winner, result = play_quiet_game([RANDOM, CRASHING], seed=0)
+    assert winner == 0
+    assert result.startswith("error: black crashed (ZeroDivisionError")
+    winner, result = play_quiet_game([(__name__, "CrashingInitPlayer"),
+        RANDOM], seed=0)
+    assert winner == 1
+    assert result.startswith("error: white crashed (ZeroDivisionError")
+
+def test_tournament_continues_past_a_crash(tmp_path):
+    with ResultStore(str(tmp_path / "results.db")) as store:
+        outcomes = run_tournament([RANDOM, CRASHING], store, games=2, jobs=2)
+    assert len(outcomes) == 4
+    assert standings(2, outcomes)[1] == [0, 0, 4]